@@ -3,43 +3,55 @@ from flask_cors import CORS
 import os
 import re
 import json
-import nltk
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 from log_parser import parse_log_line
-from rag.ingest import ingest_parsed_logs
-from rag.retrieval import answer_question
+from startup import get_genai, start_background_init, readiness
 from metrics import compute_metrics
-
-# --- NLTK setup (safe) ---
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    try:
-        nltk.download('punkt', quiet=True)
-    except Exception:
-        pass
+from parser.detected_suspicious import SuspiciousActivityDetector
+from template_anomaly import TemplateRateDetector
+from result_cache import ParsedResultCache, content_key
+from llm_cache import LLMResponseCache, template_fingerprint
+from batch import expand_uploads, process_batch, merge_metrics
+from trigram_index import TrigramIndexBuilder, index_exists, latest_index, mark_latest, open_index
 
 # --- App setup ---
 load_dotenv()
 app = Flask(__name__)
 CORS(app)
+# Drain3 state, NLTK data and the LLM/vector stacks load in the background;
+# /ready reports when parsing can be served
+start_background_init()
 
 UPLOADS_DIR = "uploads"
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 LAST_LOG_PATH = os.path.join(UPLOADS_DIR, "last.log")
 
+result_cache = ParsedResultCache()
+llm_cache = LLMResponseCache()
+
+GEMINI_MODEL = "gemini-2.5-flash"
+# Bump whenever the analysis prompt below changes; part of the LLM cache key
+PROMPT_VERSION = "1"
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
 
 
-def analyze_with_gemini(parsed_logs):
+def ingest_parsed_logs(parsed_logs):
+    # LangChain/Pinecone are imported on first use, not at app import
+    from rag.ingest import ingest_parsed_logs as _ingest
+    return _ingest(parsed_logs)
+
+
+def analyze_with_gemini(parsed_logs, template_anomalies=None, use_cache=True, anomalies=None):
     """
     Ask Gemini to summarize/assess logs. Returns dict.
     Falls back to simple structured summary if Gemini not configured.
+    template_anomalies: lines from TemplateRateDetector.describe(), added to the prompt.
+    anomalies: the detector's anomaly records behind those lines, for the cache key.
+    Responses are memoized by template fingerprint; use_cache=False forces a fresh call.
     """
+    template_anomalies = template_anomalies or []
     try:
         if not GEMINI_API_KEY:
             # Fallback: lightweight local summary
@@ -49,12 +61,18 @@ def analyze_with_gemini(parsed_logs):
             return {
                 "summary": f"Parsed {len(parsed_logs)} lines; {errors} errors, {warns} warnings.",
                 "insights": ["Local summary used (Gemini API key not set)."],
-                "anomalies": ["Counts only; no LLM analysis."],
+                "anomalies": template_anomalies or ["Counts only; no LLM analysis."],
                 "recommendations": ["Set GEMINI_API_KEY to enable deep analysis."],
                 "threat_level": "Medium" if errors > 0 else "Low",
             }
 
-        model = genai.GenerativeModel("gemini-2.5-flash")
+        fingerprint = template_fingerprint(parsed_logs, GEMINI_MODEL, PROMPT_VERSION, anomalies)
+        if use_cache:
+            hit = llm_cache.get(fingerprint)
+            if hit is not None:
+                return dict(hit, cached=True)
+
+        model = get_genai().GenerativeModel(GEMINI_MODEL)
         lines = []
         for log in parsed_logs:
             parts = [
@@ -74,6 +92,9 @@ Return ONLY valid JSON with fields:
 - "recommendations": array of concrete actions
 - "threat_level": one of Low/Medium/High
 
+Template rate anomalies (per-minute Drain3 cluster frequencies vs. learned baseline):
+{os.linesep.join(template_anomalies) or "none detected"}
+
 Logs:
 {os.linesep.join(lines)}
 """
@@ -93,7 +114,12 @@ Logs:
             text = re.sub(r"^```(?:json)?", "", text, flags=re.I).strip()
             text = re.sub(r"```$", "", text).strip()
 
-        return json.loads(text)
+        result = json.loads(text)
+        try:
+            llm_cache.put(fingerprint, result)
+        except OSError as e:
+            print("LLM cache write failed:", e)
+        return result
     except Exception as e:
         return {"error": "Gemini analysis failed", "exception": str(e)}
 
@@ -105,7 +131,8 @@ def upload_file():
 
     file = request.files["file"]
     try:
-        content = file.read().decode("utf-8", errors="ignore").splitlines()
+        raw = file.read()
+        content = raw.decode("utf-8", errors="ignore").splitlines()
     except Exception:
         return jsonify({"error": "Unable to read file as UTF-8"}), 400
 
@@ -113,26 +140,191 @@ def upload_file():
     with open(LAST_LOG_PATH, "w", encoding="utf-8") as f:
         f.write("\n".join(content))
 
-    parsed_logs = [parse_log_line(line) for line in content if line.strip()]
+    # Same bytes + same parser version -> reuse the cached parse instead of re-parsing
+    analysis_id = content_key(raw)
+    cached = result_cache.get_summary(analysis_id)
+    parsed_logs = result_cache.load_records(analysis_id) if cached is not None else None
+    if parsed_logs is None:
+        cached = None
 
-    gemini_analysis = analyze_with_gemini(parsed_logs)
-
-    # Ingest to local RAG stub (safe)
+    # Trigram search index for /search, built from the same pass when missing
+    indexer = None if index_exists(analysis_id) else TrigramIndexBuilder(analysis_id)
+    # Any failure before finish() must not leave the half-built tmp dir behind
     try:
-        ingested = ingest_parsed_logs(parsed_logs)
-    except Exception as e:
-        ingested = 0
-        print("Ingestion error:", e)
+        if cached is not None:
+            suspicious_activity = cached.get("suspicious_activity", {})
+            template_anomalies = cached.get("template_anomalies", {})
+            anomaly_lines = cached.get("template_anomaly_lines", [])
+            # /metrics pairs last.log with the stored report, so it must follow this upload too
+            try:
+                TemplateRateDetector.save_last_report(template_anomalies)
+            except OSError as e:
+                print("Template rate state not saved:", e)
+            if indexer is not None:
+                for line, parsed in zip((l for l in content if l.strip()), parsed_logs):
+                    indexer.add(line, parsed["cluster_id"], parsed["template"])
+        else:
+            # Feed the brute-force detector from the same pass that parses the lines
+            detector = SuspiciousActivityDetector()
+            rate_detector = TemplateRateDetector.load()
+            parsed_logs = []
+            for line in content:
+                if not line.strip():
+                    continue
+                parsed = parse_log_line(line)
+                parsed_logs.append(parsed)
+                detector.observe(line)
+                rate_detector.observe(parsed["cluster_id"], parsed["template"], parsed["timestamp"])
+                if indexer is not None:
+                    indexer.add(line, parsed["cluster_id"], parsed["template"])
+
+            rate_detector.flush()
+            suspicious_activity = detector.get_summary()
+            template_anomalies = rate_detector.get_report()
+            anomaly_lines = rate_detector.describe()
+            try:
+                rate_detector.save(template_anomalies)
+            except OSError as e:
+                print("Template rate state not saved:", e)
+
+            try:
+                result_cache.put(analysis_id, parsed_logs, {
+                    "suspicious_activity": suspicious_activity,
+                    "template_anomalies": template_anomalies,
+                    "template_anomaly_lines": anomaly_lines,
+                })
+            except Exception as e:
+                print("Result cache write failed:", e)
+
+        try:
+            if indexer is not None:
+                indexer.finish()
+                indexer = None
+            else:
+                mark_latest(analysis_id)
+        except OSError as e:
+            print("Search index not written:", e)
+    finally:
+        if indexer is not None:
+            indexer.abort()
+
+    bypass = (request.args.get("no_cache") or request.form.get("no_cache") or "").lower() in ("1", "true", "yes")
+    gemini_analysis = analyze_with_gemini(parsed_logs, anomaly_lines, use_cache=not bypass,
+                                          anomalies=template_anomalies.get("anomalies", []))
+
+    # Ingest to local RAG stub (safe); skipped when this exact file was already ingested
+    ingested = (cached or {}).get("ingested_chunks", 0)
+    ingest_error = None
+    if not ingested:
+        try:
+            ingested = ingest_parsed_logs(parsed_logs)
+            result_cache.update_summary(analysis_id, ingested_chunks=ingested)
+        except Exception as e:
+            # Batches upserted before the failure are checkpointed; re-uploading resumes
+            ingested = getattr(e, "upserted", 0)
+            ingest_error = str(e)
+            print("Ingestion error:", e)
 
     return jsonify(
         {
+            "analysis_id": analysis_id,
+            "cached": cached is not None,
             "parsed_logs": parsed_logs,
             "gemini_insights": gemini_analysis,
             "ingested_chunks": ingested,
+            "ingest_error": ingest_error,
+            "suspicious_activity": suspicious_activity,
+            "template_anomalies": template_anomalies,
+        }
+    )
+
+
+@app.route("/upload/batch", methods=["POST"])
+def upload_batch():
+    """Several log files (field `files`, repeatable) and/or zip/tar archives at once.
+    Files are parsed in parallel worker processes; each source has its own template miner."""
+    files = request.files.getlist("files") or request.files.getlist("file")
+    if not files:
+        return jsonify({"error": "No files uploaded"}), 400
+
+    try:
+        uploads = expand_uploads(files)
+    except Exception as e:
+        return jsonify({"error": f"Unable to read upload: {e}"}), 400
+    if not uploads:
+        return jsonify({"error": "No log files found in upload"}), 400
+
+    results = process_batch(uploads, ingest=ingest_parsed_logs)
+    batch_metrics = merge_metrics(results)
+
+    all_logs = [log for r in results for log in r["parsed_logs"]]
+    anomaly_lines = []
+    anomalies = []
+    for source in dict.fromkeys(r["source"] for r in results):
+        first = next(r for r in results if r["source"] == source)
+        anomaly_lines += first["template_anomaly_lines"]
+        anomalies += [dict(a, source=source) for a in first["template_anomalies"].get("anomalies", [])]
+    bypass = (request.args.get("no_cache") or request.form.get("no_cache") or "").lower() in ("1", "true", "yes")
+    gemini_analysis = analyze_with_gemini(all_logs, anomaly_lines, use_cache=not bypass, anomalies=anomalies)
+
+    return jsonify(
+        {
+            "files": results,
+            "total_lines": len(all_logs),
+            "metrics": batch_metrics,
+            "gemini_insights": gemini_analysis,
+            "ingested_chunks": sum(r.get("ingested_chunks", 0) for r in results),
         }
     )
 
 
+@app.route("/analysis/<analysis_id>", methods=["GET"])
+def get_analysis(analysis_id):
+    """Re-open a cached analysis; ?columns=a,b&offset=&limit= prune what is read"""
+    try:
+        summary = result_cache.get_summary(analysis_id)
+        if summary is None:
+            return jsonify({"error": "Analysis not found"}), 404
+
+        columns = [c for c in request.args.get("columns", "").split(",") if c] or None
+        offset = request.args.get("offset", 0, type=int)
+        limit = request.args.get("limit", type=int)
+        rows = result_cache.load_records(analysis_id, columns=columns, offset=offset, limit=limit)
+        return jsonify({"analysis_id": analysis_id, "summary": summary, "parsed_logs": rows or []})
+    except ValueError:
+        return jsonify({"error": "Invalid analysis id"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/search", methods=["GET"])
+def search():
+    """Regex/substring search over an uploaded log via its trigram index.
+    ?q=&mode=regex|substring&ignore_case=1&page=1&page_size=50&analysis_id= (default: latest upload)"""
+    query_text = request.args.get("q", "")
+    if not query_text:
+        return jsonify({"error": "No query provided"}), 400
+
+    analysis_id = request.args.get("analysis_id") or latest_index()
+    if not analysis_id or not analysis_id.isalnum() or not index_exists(analysis_id):
+        return jsonify({"error": "No search index for this upload"}), 404
+
+    page = max(request.args.get("page", 1, type=int), 1)
+    page_size = min(max(request.args.get("page_size", 50, type=int), 1), 500)
+    regex = request.args.get("mode", "regex") != "substring"
+    ignore_case = request.args.get("ignore_case", "").lower() in ("1", "true", "yes")
+    try:
+        result = open_index(analysis_id).search(
+            query_text, regex=regex, ignore_case=ignore_case, page=page, page_size=page_size
+        )
+    except (ValueError, re.error) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    result["analysis_id"] = analysis_id
+    return jsonify(result)
+
+
 @app.route("/query", methods=["POST"])
 def query():
     try:
@@ -140,12 +332,27 @@ def query():
         question = data.get("question")
         if not question:
             return jsonify({"error": "No question provided"}), 400
-        result = answer_question(question)
+        filters = data.get("filters")
+        if filters is not None and not isinstance(filters, dict):
+            return jsonify({"error": "filters must be an object"}), 400
+        from rag.filters import validate_filters
+        try:
+            filters = validate_filters(filters) if filters else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        from rag.retrieval import answer_question
+        result = answer_question(question, filters=filters)
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    status = readiness()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+
 @app.route("/metrics", methods=["GET"])
 def metrics():
     try:
@@ -156,6 +363,7 @@ def metrics():
             lines = f.readlines()
 
         metrics = compute_metrics(lines)
+        metrics["template_anomalies"] = TemplateRateDetector.load_last_report()
         return jsonify(metrics)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
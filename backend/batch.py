@@ -0,0 +1,197 @@
+# backend/batch.py
+import io
+import os
+import re
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Dict, Any, List, Tuple
+
+from log_parser import parse_log_line, create_template_miner
+from metrics import LogMetrics
+from parser.detected_suspicious import SuspiciousActivityDetector
+from template_anomaly import TemplateRateDetector
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 2)))
+MAX_MEMBER_BYTES = int(os.getenv("BATCH_MAX_MEMBER_BYTES", str(512 * 1024 * 1024)))
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# First matching rule wins; checked against a sample of the file's first lines
+SOURCE_RULES = [
+    ("auth", re.compile(r'\b(sshd|sudo|CRON|pam_unix|systemd-logind)\b')),
+    ("windows", re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}, (Info|Warning|Error)\s+(CBS|CSI)', re.M)),
+    ("apache", re.compile(r'^\[\w{3} \w{3} \d{2} [\d:]+ \d{4}\] \[\w+\]|"(GET|POST|HEAD|PUT|DELETE) \S+ HTTP/', re.M)),
+]
+
+_pool = None
+
+# Per-process miners by source, so a worker replays the journal once, not per file
+_miners = {}
+_miners_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the Flask process is threaded (request threads, miner warm-up)
+        _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+def _get_miner(source: str):
+    with _miners_lock:
+        miner = _miners.get(source)
+        if miner is None:
+            miner = _miners[source] = create_template_miner(f"drain3_state_{source}.bin")
+        return miner
+
+
+def detect_source(lines: List[str]) -> str:
+    sample = "\n".join(lines[:50])
+    for name, rx in SOURCE_RULES:
+        if rx.search(sample):
+            return name
+    return "generic"
+
+
+def expand_uploads(files) -> List[Tuple[str, bytes]]:
+    """(filename, bytes) for every uploaded file, unpacking zip/tar archives in memory"""
+    out = []
+    for f in files:
+        name = f.filename or "upload.log"
+        data = f.read()
+        lower = name.lower()
+        if lower.endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or info.file_size > MAX_MEMBER_BYTES:
+                        continue
+                    out.append((os.path.basename(info.filename), zf.read(info)))
+        elif lower.endswith(ARCHIVE_SUFFIXES):
+            with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as tf:
+                for member in tf.getmembers():
+                    if not member.isfile() or member.size > MAX_MEMBER_BYTES:
+                        continue
+                    out.append((os.path.basename(member.name), tf.extractfile(member).read()))
+        else:
+            out.append((name, data))
+    return [(n, d) for n, d in out if n and not n.startswith(".")]
+
+
+def _parse_file(source: str, index: int, filename: str, lines: List[str]) -> Dict[str, Any]:
+    """Worker: parse one file with its source's template miner
+
+    The per-source miner is a SharedTemplateMiner, so files of the same source
+    can be parsed in parallel processes and still get the same cluster ids.
+    Each file ends with a snapshot; left to its snapshot interval, a miner
+    that lives for one batch would never write drain3_state_<source>.bin.
+    """
+    miner = _get_miner(source)
+    detector = SuspiciousActivityDetector()
+    parsed_logs = []
+    for line in lines:
+        if not line.strip():
+            continue
+        parsed = parse_log_line(line, miner=miner)
+        parsed["source"] = source
+        parsed_logs.append(parsed)
+        detector.observe(line)
+    try:
+        miner.save_state()
+    except OSError as e:
+        print(f"Drain3 snapshot not saved ({source}):", e)
+    metrics = LogMetrics()
+    metrics.update(parsed_logs)
+
+    return {
+        "index": index,
+        "filename": filename,
+        "source": source,
+        "lines": len(parsed_logs),
+        "parsed_logs": parsed_logs,
+        "metrics": metrics.summary(),
+        # Serialized sketches, merged across files by merge_metrics()
+        "metrics_state": metrics.to_dict(),
+        "suspicious_activity": detector.get_summary(),
+    }
+
+
+def _detect_template_rates(source: str, results: List[Dict[str, Any]]) -> None:
+    """Run one source's rate detector over its files in upload order
+
+    Kept out of the workers: the detector's persisted baselines are per source
+    and must see the files one after another.
+    """
+    rate_detector = TemplateRateDetector.load(state_file=f"template_rates_state_{source}.json")
+    for result in results:
+        for parsed in result["parsed_logs"]:
+            rate_detector.observe(parsed["cluster_id"], parsed["template"], parsed["timestamp"])
+        rate_detector.flush()
+
+    report = rate_detector.get_report()
+    try:
+        rate_detector.save(report)
+    except OSError:
+        pass
+    lines = rate_detector.describe()
+    for result in results:
+        result["template_anomalies"] = report
+        result["template_anomaly_lines"] = lines
+
+
+def merge_metrics(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combined metrics of a batch; pops each file's `metrics_state`"""
+    combined = LogMetrics()
+    for result in results:
+        state = result.pop("metrics_state", None)
+        if state:
+            combined.merge(LogMetrics.from_dict(state))
+    return combined.summary()
+
+
+def process_batch(uploads: List[Tuple[str, bytes]], ingest=None) -> List[Dict[str, Any]]:
+    """Parse all uploads concurrently (one process task per file) and run
+    `ingest(parsed_logs)` in a thread pool as soon as each file is parsed.
+    Returns per-file results in upload order."""
+    files = []
+    for index, (filename, data) in enumerate(uploads):
+        lines = data.decode("utf-8", errors="ignore").splitlines()
+        files.append((detect_source(lines), index, filename, lines))
+
+    def _ingest(result):
+        try:
+            return ingest(result["parsed_logs"])
+        except Exception as e:
+            print(f"Ingestion error ({result['filename']}):", e)
+            result["ingest_error"] = str(e)
+            return getattr(e, "upserted", 0)
+
+    results = []
+    ingests = {}
+    with ThreadPoolExecutor(max_workers=min(len(files), BATCH_WORKERS) or 1) as tp:
+        if len(files) == 1:
+            # Nothing to overlap; skip the pickling round-trip
+            parsed = [_parse_file(*files[0])]
+        else:
+            pool = _get_pool()
+            parsed = as_completed([pool.submit(_parse_file, *f) for f in files])
+        for item in parsed:
+            result = item if isinstance(item, dict) else item.result()
+            results.append(result)
+            if ingest is not None:
+                ingests[tp.submit(_ingest, result)] = result
+
+        by_source = {}
+        for result in sorted(results, key=lambda r: r["index"]):
+            by_source.setdefault(result["source"], []).append(result)
+        for source, source_results in by_source.items():
+            _detect_template_rates(source, source_results)
+
+        for fut, result in ingests.items():
+            result["ingested_chunks"] = fut.result()
+
+    results.sort(key=lambda r: r.pop("index"))
+    return results
@@ -0,0 +1,126 @@
+# backend/bench_ingest.py
+"""
+Throughput of the RAG upsert pipeline against a local stand-in vector store.
+
+The stand-in is LangChain's InMemoryVectorStore with the local hashing
+embedder, plus a simulated per-request latency and an optional throttling
+rate (429-style errors), so batch size / worker / retry settings can be tuned
+without Pinecone or Gemini. The sample logs are replicated to --lines.
+
+    python bench_ingest.py
+    python bench_ingest.py --workers 1 4 8 --batch-size 50 --throttle 0.1
+    python bench_ingest.py --fail-after 20     # shows resume from checkpoint
+"""
+import argparse
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from log_parser import parse_log_line, create_template_miner
+from rag.embeddings import HashingEmbeddings
+from rag.ingest import build_documents, chunk_documents, make_doc_id
+from rag.pipeline import UpsertPipeline, IngestCheckpoint, IngestError
+
+
+class StandInStore(InMemoryVectorStore):
+    """InMemoryVectorStore with network-like latency and throttling"""
+
+    def __init__(self, latency: float, per_doc: float, throttle: float, fail_after: int = 0):
+        super().__init__(HashingEmbeddings())
+        self.latency = latency
+        self.per_doc = per_doc
+        self.throttle = throttle
+        self.fail_after = fail_after
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add_documents(self, documents, ids=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.latency + self.per_doc * len(documents))
+        if self.fail_after and calls > self.fail_after:
+            raise ConnectionError("simulated outage")
+        if random.random() < self.throttle:
+            raise RuntimeError("429 Too Many Requests")
+        return super().add_documents(documents, ids=ids, **kwargs)
+
+
+def _chunks(total_lines: int):
+    here = os.path.dirname(os.path.abspath(__file__))
+    lines = []
+    for path in sorted(glob.glob(os.path.join(here, "logs", "*.log"))):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            lines += [l.rstrip("\n") for l in f if l.strip()]
+    lines = (lines * (total_lines // len(lines) + 1))[:total_lines]
+
+    tmp = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        miner = create_template_miner(os.path.join(tmp, "drain3_state.bin"))
+        parsed = [parse_log_line(l, miner=miner) for l in lines]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    # Replicated lines would produce duplicate ids; keep their position in the id
+    chunks = chunk_documents(build_documents(parsed))
+    ids = [make_doc_id(f"{i}:{c.page_content}", c.metadata) for i, c in enumerate(chunks)]
+    return chunks, ids
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lines", type=int, default=20000)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--batch-size", type=int, default=100)
+    ap.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    ap.add_argument("--per-doc", type=float, default=0.0005, help="extra seconds per chunk")
+    ap.add_argument("--throttle", type=float, default=0.0, help="probability a request is throttled")
+    ap.add_argument("--fail-after", type=int, default=0, help="simulate an outage after N requests")
+    args = ap.parse_args()
+
+    chunks, ids = _chunks(args.lines)
+    print(f"{len(chunks)} chunks from {args.lines} lines, batch size {args.batch_size}, "
+          f"latency {args.latency * 1000:.0f} ms + {args.per_doc * 1000:.1f} ms/chunk, throttle {args.throttle:.0%}")
+
+    # Baseline: the old single add_documents call
+    store = StandInStore(args.latency, args.per_doc, 0.0)
+    t = time.time()
+    store.add_documents(chunks, ids=ids)
+    base = len(chunks) / (time.time() - t)
+    print(f"single call          {base:>9.0f} chunks/s")
+
+    ckpt_dir = tempfile.mkdtemp(prefix="ingest_ckpt_")
+    try:
+        for workers in args.workers:
+            store = StandInStore(args.latency, args.per_doc, args.throttle, args.fail_after)
+            pipeline = UpsertPipeline(store, batch_size=args.batch_size, workers=workers,
+                                      backoff_base=0.05, backoff_max=1.0)
+            checkpoint = IngestCheckpoint(IngestCheckpoint.job_id(ids, f"bench{workers}"), ckpt_dir)
+            try:
+                stats = pipeline.run(chunks, ids, checkpoint=checkpoint)
+            except IngestError as e:
+                print(f"workers={workers:<3} failed: {e}")
+                store.fail_after = 0
+                stats = UpsertPipeline(store, batch_size=args.batch_size, workers=workers).run(
+                    chunks, ids, checkpoint=checkpoint)
+                print(f"            resumed: skipped {stats['skipped']} checkpointed chunks")
+            stored = len(store.store)
+            print(f"workers={workers:<3} {stats['chunks_per_s']:>9.0f} chunks/s  x{stats['chunks_per_s'] / base:.1f}"
+                  f"  batches {stats['batches']}  retries {stats['retries']}  throttled {stats['throttled']}"
+                  f"  final batch {stats['batch_size']}  stored {stored}")
+            if stored != len(chunks):
+                print("FAIL: stored chunk count does not match")
+                return 1
+    finally:
+        shutil.rmtree(ckpt_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
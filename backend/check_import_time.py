@@ -0,0 +1,79 @@
+# backend/check_import_time.py
+"""
+Import-time regression check for the Flask app.
+
+Runs `python -X importtime -c "import app"` in fresh interpreters, takes the
+best cumulative time for `app`, and fails if it exceeds the budget or if any of
+the lazily-loaded stacks got imported eagerly again.
+
+    python check_import_time.py                 # default budget
+    python check_import_time.py --budget-ms 400
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "500"))
+
+# Must not be imported by `import app` (see startup.py)
+LAZY_MODULES = [
+    "google.generativeai", "langchain_core", "langchain_google_genai", "langchain_pinecone",
+    "langchain_text_splitters", "pinecone", "nltk", "pandas", "pyarrow",
+]
+
+RX_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure(module: str = "app") -> dict:
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PRELOAD_STACKS="0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=here, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    total_us = None
+    imported = set()
+    for line in proc.stderr.splitlines():
+        m = RX_LINE.match(line)
+        if not m:
+            continue
+        imported.add(m.group(4))
+        if m.group(4) == module and len(m.group(3)) <= 1:
+            total_us = int(m.group(2))
+    return {"total_ms": (total_us or 0) / 1000, "imported": imported}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--module", default="app")
+    args = ap.parse_args()
+
+    runs = [measure(args.module) for _ in range(max(args.runs, 1))]
+    best = min(r["total_ms"] for r in runs)
+    eager = sorted(
+        name for name in LAZY_MODULES
+        if any(m == name or m.startswith(name + ".") for m in runs[0]["imported"])
+    )
+
+    print(f"import {args.module}: best {best:.1f} ms of {len(runs)} runs (budget {args.budget_ms:.0f} ms)")
+    ok = True
+    if best > args.budget_ms:
+        print("FAIL: import time over budget")
+        ok = False
+    if eager:
+        print("FAIL: lazily-loaded modules imported eagerly: " + ", ".join(eager))
+        ok = False
+    if ok:
+        print("OK")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
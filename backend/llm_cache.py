@@ -0,0 +1,112 @@
+# backend/llm_cache.py
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "llm_cache")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+
+
+def _bucket(count: int) -> int:
+    """Log2 bucket so 100 vs 110 occurrences of a template map to the same key"""
+    return int(math.log2(count)) if count > 0 else 0
+
+
+def template_fingerprint(parsed_logs: List[Dict[str, Any]], model: str, prompt_version: str,
+                         anomalies: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Fingerprint of an upload's Drain3 template mix for LLM memoization
+
+    Built from the set of (source, cluster id) pairs with log2-bucketed counts,
+    plus the prompt version and model name, so near-identical uploads share a
+    key. The source is included because batch uploads mine each source with its
+    own miner, whose cluster ids overlap. Template rate anomalies are part of the
+    prompt, so they enter the key as the set of (source, type, cluster id); their
+    minutes and EWMA baselines shift with every upload and are left out.
+    """
+    counts = Counter((log.get("source", ""), log.get("cluster_id", -1)) for log in parsed_logs)
+    mix = sorted((src, int(cid), _bucket(n)) for (src, cid), n in counts.items())
+    flagged = sorted({(a.get("source", ""), a.get("type", ""), int(a.get("cluster_id", -1)))
+                      for a in anomalies or []})
+    raw = json.dumps({"mix": mix, "anomalies": flagged,
+                      "model": model, "prompt": prompt_version}, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Persistent TTL + size-limited cache of LLM analysis responses
+
+    One JSON file per fingerprint; file mtime is the LRU clock and the stored
+    `created` time drives TTL expiry.
+    """
+
+    def __init__(self, cache_dir: str = LLM_CACHE_DIR, ttl: int = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        path = self._path(fingerprint)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.ttl and time.time() - entry.get("created", 0) > self.ttl:
+            self._remove(path)
+            return None
+        os.utime(path)  # touch for LRU
+        return entry.get("response")
+
+    def put(self, fingerprint: str, response: Dict[str, Any]) -> None:
+        path = self._path(fingerprint)
+        tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "response": response}, f)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove expired entries, then least-recently-used ones beyond max_entries"""
+        now = time.time()
+        entries = []
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            # mtime >= created, so an entry untouched for longer than ttl is certainly expired
+            if self.ttl and now - mtime > self.ttl:
+                self._remove(path)
+                removed += 1
+            else:
+                entries.append((mtime, path))
+
+        excess = len(entries) - self.max_entries
+        for _, path in sorted(entries)[:max(excess, 0)]:
+            self._remove(path)
+            removed += 1
+        return removed
+
+    def _path(self, fingerprint: str) -> str:
+        if not fingerprint.isalnum():
+            raise ValueError("Invalid fingerprint")
+        return os.path.join(self.cache_dir, f"{fingerprint}.json")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
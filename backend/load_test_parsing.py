@@ -0,0 +1,106 @@
+# backend/load_test_parsing.py
+"""
+Load test for the parsing core under multiple workers.
+
+Each worker process parses its own share of the sample logs (replicated to the
+requested size) through a SharedTemplateMiner on a common, fresh state file,
+the way gunicorn/uwsgi workers would. Reports aggregate lines/sec per worker
+count and checks that all workers agree on every template's cluster id.
+
+    python load_test_parsing.py                        # 1, 2, 4 workers
+    python load_test_parsing.py --workers 1 2 4 8 --lines 200000
+    python load_test_parsing.py --threads 4            # threads per worker
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+
+from log_parser import parse_log_line, create_template_miner
+
+
+def _sample_lines(total: int) -> list:
+    here = os.path.dirname(os.path.abspath(__file__))
+    lines = []
+    for path in sorted(glob.glob(os.path.join(here, "logs", "*.log"))):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            lines += [l.rstrip("\n") for l in f if l.strip()]
+    if not lines:
+        raise RuntimeError("no sample logs found under logs/")
+    return (lines * (total // len(lines) + 1))[:total]
+
+
+def _worker(args):
+    state_file, lines, threads, start_at = args
+    miner = create_template_miner(state_file)
+    while time.time() < start_at:  # all workers start together, after loading
+        time.sleep(0.001)
+
+    t = time.perf_counter()
+    if threads > 1:
+        step = (len(lines) + threads - 1) // threads
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            parts = pool.map(lambda i: [parse_log_line(l, miner=miner) for l in lines[i:i + step]],
+                             range(0, len(lines), step))
+            parsed = [p for part in parts for p in part]
+    else:
+        parsed = [parse_log_line(l, miner=miner) for l in lines]
+    elapsed = time.perf_counter() - t
+
+    # Template changes can be picked up at different moments, so compare on the raw line
+    ids = {p["message"]: p["cluster_id"] for p in parsed}
+    return elapsed, len(parsed), ids
+
+
+def run(workers: int, lines: list, threads: int) -> dict:
+    tmp = tempfile.mkdtemp(prefix="drain3_load_")
+    try:
+        state_file = os.path.join(tmp, "drain3_state.bin")
+        share = len(lines) // workers
+        start_at = time.time() + 1.0 + 0.2 * workers
+        jobs = [(state_file, lines[i * share:(i + 1) * share], threads, start_at) for i in range(workers)]
+        with get_context("spawn").Pool(workers) as pool:
+            results = pool.map(_worker, jobs)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    wall = max(r[0] for r in results)
+    total = sum(r[1] for r in results)
+    # Same line must land in the same cluster in every worker
+    seen = {}
+    conflicts = 0
+    for _, _, ids in results:
+        for line, cid in ids.items():
+            if seen.setdefault(line, cid) != cid:
+                conflicts += 1
+    return {"workers": workers, "lines": total, "seconds": wall,
+            "lines_per_s": total / wall if wall else 0.0, "id_conflicts": conflicts}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--lines", type=int, default=100000, help="total lines, split across workers")
+    ap.add_argument("--threads", type=int, default=1)
+    args = ap.parse_args()
+
+    lines = _sample_lines(args.lines)
+    print(f"{os.cpu_count()} CPUs, {len(lines)} lines, {args.threads} thread(s) per worker")
+    base = None
+    ok = True
+    for n in args.workers:
+        r = run(n, lines, args.threads)
+        base = base or r["lines_per_s"]
+        print(f"workers={n:<3} {r['lines_per_s']:>10.0f} lines/s  speedup x{r['lines_per_s'] / base:.2f}"
+              f"  id conflicts: {r['id_conflicts']}")
+        ok = ok and r["id_conflicts"] == 0
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,19 @@
 import re
+import calendar
+import threading
+from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 
-from drain3 import TemplateMiner
 from drain3.template_miner_config import TemplateMinerConfig
-from drain3.file_persistence import FilePersistence
+
+from shared_miner import SharedTemplateMiner
+
+# Bump when parse_log_line output changes; invalidates cached parse results
+PARSER_VERSION = "2"
 
 # -------- Drain3 setup --------
 # Persistence so learned templates survive restarts
 PERSIST_FILE = "drain3_state.bin"
-persistence = FilePersistence(PERSIST_FILE)
 
 config = TemplateMinerConfig()
 # If you include a drain3.ini next to this file, it will be picked up here:
@@ -17,12 +22,34 @@ try:
 except Exception:
     config.load_default()
 
-template_miner = TemplateMiner(persistence, config)
+# Loading the persisted state is deferred to first use (or startup.py's warm-up
+# thread) so that importing this module stays cheap
+template_miner = None
+_miner_lock = threading.Lock()
+
+
+def get_template_miner() -> SharedTemplateMiner:
+    global template_miner
+    if template_miner is None:
+        with _miner_lock:
+            if template_miner is None:
+                template_miner = SharedTemplateMiner(PERSIST_FILE, config)
+    return template_miner
+
+
+def miner_loaded() -> bool:
+    return template_miner is not None
+
+
+def create_template_miner(persist_file: str) -> SharedTemplateMiner:
+    """Independent miner with its own state file (e.g. one per log source)"""
+    return SharedTemplateMiner(persist_file, config)
+
 
 # -------- Light enrichment regex (best-effort) --------
 RX_TIMESTAMP = re.compile(
     r'(?P<ts>\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})?'
-    r'|\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}'
+    r'|(?:(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun)\s+)?\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}(?:\s+\d{4}(?!\d))?'
     r'|\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2}\s+[+-]\d{4})'
 )
 RX_IP = re.compile(r'(?P<ip>\b\d{1,3}(?:\.\d{1,3}){3}\b|\b[0-9a-fA-F:]{2,}\b)')
@@ -47,16 +74,67 @@ def best_effort_extract(line: str) -> Dict[str, Optional[str]]:
 
     return {"timestamp": ts or "", "ip": ip or "", "level": level or ""}
 
-def parse_log_line(line: str) -> Dict[str, Any]:
+# Formats of the timestamps RX_TIMESTAMP captures; (format, prefix width or None for all)
+_TS_FORMATS = [
+    ("%Y-%m-%d %H:%M:%S", 19),
+    ("%Y-%m-%dT%H:%M:%S", 19),
+    ("%d/%b/%Y:%H:%M:%S", 20),
+    ("%a %b %d %H:%M:%S %Y", None),  # Apache error log: [Sun Dec 04 04:47:44 2005]
+    ("%b %d %H:%M:%S %Y", None),
+]
+# Syslog-style stamps without a year; see _infer_year
+_TS_FORMATS_NO_YEAR = ["%a %b %d %H:%M:%S", "%b %d %H:%M:%S"]
+
+def _infer_year(ts: str, fmt: str) -> Optional[datetime]:
+    """Latest year that does not put `ts` in the future (Feb 29 may need to go
+    back to a leap year); a day of slack covers logs from timezones ahead of ours"""
+    now = datetime.now()
+    for year in range(now.year, now.year - 4, -1):
+        try:
+            dt = datetime.strptime(f"{year} {ts}", "%Y " + fmt)
+        except ValueError:  # wrong format, or Feb 29 outside a leap year
+            continue
+        if dt <= now + timedelta(days=1):
+            return dt
+    return None
+
+def parse_timestamp(ts: str) -> Optional[datetime]:
+    """Naive wall-clock datetime for a timestamp string from best_effort_extract"""
+    if not ts:
+        return None
+    ts = " ".join(ts.split())
+    for fmt, width in _TS_FORMATS:
+        try:
+            dt = datetime.strptime(ts[:width] if width else ts, fmt)
+        except ValueError:
+            continue
+        return dt
+    for fmt in _TS_FORMATS_NO_YEAR:
+        dt = _infer_year(ts, fmt)
+        if dt is not None:
+            return dt
+    return None
+
+def wall_clock_epoch(ts: str) -> Optional[int]:
+    """Seconds since epoch, reading the log's wall-clock time as UTC"""
+    dt = parse_timestamp(ts)
+    return calendar.timegm(dt.timetuple()) if dt else None
+
+def minute_of(ts: str) -> Optional[int]:
+    """Minutes since epoch for the timestamp strings produced by parse_log_line"""
+    epoch = wall_clock_epoch(ts)
+    return epoch // 60 if epoch is not None else None
+
+def parse_log_line(line: str, miner: Optional[SharedTemplateMiner] = None) -> Dict[str, Any]:
     """
     Universal parser:
-    - Uses Drain3 to mine/assign a template + cluster
+    - Uses Drain3 to mine/assign a template + cluster (global miner unless `miner` given)
     - Adds best-effort timestamp, level, ip
     - Always returns a consistent dictionary
     """
     line = (line or "").rstrip("\n")
 
-    d3 = template_miner.add_log_message(line) or {}
+    d3 = (miner or get_template_miner()).add_log_message(line) or {}
     template = d3.get("template_mined")
     cluster_id = d3.get("cluster_id")
     params = d3.get("parameter_list") or d3.get("template_params") or []
@@ -1,42 +1,104 @@
 # backend/metrics.py
 import re
 from collections import Counter
-from typing import List, Dict
-from log_parser import parse_log_line
+from datetime import datetime, timezone
+from typing import List, Dict, Any
+from log_parser import parse_log_line, minute_of
+from sketches import HyperLogLog, SpaceSaving
+
+RX_STATUS = re.compile(r"\s(\d{3})\s")
+
+# Counters for unbounded fields (ips) keep this many entries; see sketches.py for bounds
+TOP_K_CAPACITY = 1000
+
 
 def compute_metrics(log_lines: List[str]) -> Dict:
     parsed = [parse_log_line(line) for line in log_lines if line.strip()]
+    return compute_metrics_from_parsed(parsed)
+
+
+def compute_metrics_from_parsed(parsed: List[Dict]) -> Dict:
+    """Same aggregations over already-parsed logs (no second Drain3 pass)"""
+    metrics = LogMetrics()
+    metrics.update(parsed)
+    return metrics.summary()
+
+
+class LogMetrics:
+    """Mergeable, serializable aggregate behind compute_metrics
 
-    # Aggregations
-    requests_per_minute = Counter()
-    error_codes = Counter()
-    levels = Counter()
-    ip_counter = Counter()
+    IPs go into a HyperLogLog (unique count) and a Space-Saving summary (top
+    IPs), so memory stays bounded on high-cardinality traffic. Status codes,
+    levels and minute buckets have naturally small domains and stay exact.
+    """
 
-    for log in parsed:
+    def __init__(self, top_k_capacity: int = TOP_K_CAPACITY):
+        self.requests_per_minute = Counter()
+        self.error_codes = Counter()
+        self.levels = Counter()
+        self.ips = SpaceSaving(top_k_capacity)
+        self.unique_ips = HyperLogLog()
+
+    def add(self, log: Dict[str, Any]) -> None:
         ts = log.get("timestamp", "")
         level = log.get("level", "INFO")
         ip = log.get("ip", "")
         msg = log.get("message", "")
 
-        # Normalize timestamps to minutes
-        if ts:
-            key = ts[:16]  # yyyy-mm-dd hh:mm
-            requests_per_minute[key] += 1
+        # Bucket by the actual minute whatever the timestamp format (ts[:16] kept
+        # the seconds of syslog stamps); keys read "yyyy-mm-dd hh:mm"
+        minute = minute_of(ts) if ts else None
+        if minute is not None:
+            key = datetime.fromtimestamp(minute * 60, timezone.utc).strftime("%Y-%m-%d %H:%M")
+            self.requests_per_minute[key] += 1
 
         if "HTTP" in msg:
-            m = re.search(r"\s(\d{3})\s", msg)
+            m = RX_STATUS.search(msg)
             if m:
-                error_codes[m.group(1)] += 1
+                self.error_codes[m.group(1)] += 1
 
         if level:
-            levels[level] += 1
+            self.levels[level] += 1
         if ip:
-            ip_counter[ip] += 1
-
-    return {
-        "requests_per_minute": dict(requests_per_minute),
-        "error_codes": dict(error_codes),
-        "levels": dict(levels),
-        "top_ips": dict(ip_counter.most_common(10)),
-    }
+            self.ips.add(ip)
+            self.unique_ips.add(ip)
+
+    def update(self, parsed: List[Dict[str, Any]]) -> None:
+        for log in parsed:
+            self.add(log)
+
+    def merge(self, other: "LogMetrics") -> "LogMetrics":
+        self.requests_per_minute.update(other.requests_per_minute)
+        self.error_codes.update(other.error_codes)
+        self.levels.update(other.levels)
+        self.ips.merge(other.ips)
+        self.unique_ips.merge(other.unique_ips)
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "requests_per_minute": dict(self.requests_per_minute),
+            "error_codes": dict(self.error_codes),
+            "levels": dict(self.levels),
+            "top_ips": dict(self.ips.top(10)),
+            "unique_ips": self.unique_ips.count(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests_per_minute": dict(self.requests_per_minute),
+            "error_codes": dict(self.error_codes),
+            "levels": dict(self.levels),
+            "ips": self.ips.to_dict(),
+            "unique_ips": self.unique_ips.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LogMetrics":
+        metrics = cls()
+        metrics.requests_per_minute = Counter(data["requests_per_minute"])
+        metrics.error_codes = Counter(data["error_codes"])
+        metrics.levels = Counter(data["levels"])
+        metrics.ips = SpaceSaving.from_dict(data["ips"])
+        metrics.unique_ips = HyperLogLog.from_dict(data["unique_ips"])
+        return metrics
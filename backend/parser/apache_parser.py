@@ -1,11 +1,21 @@
 # parsers/apache_parser.py
 import re
+import heapq
 import pandas as pd
+from collections import Counter
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator
 from urllib.parse import unquote
 import ipaddress
 
+from sketches import HyperLogLog, SpaceSaving, DDSketch
+
+# Low-cardinality string columns stored as pandas categoricals in chunked mode
+CATEGORICAL_COLUMNS = [
+    'method', 'protocol', 'threat_level', 'request_type', 'ip_class',
+    'file_extension', 'log_level', 'ip', 'user_agent'
+]
+
 class ApacheLogParser:
     """Complete Apache/Nginx access log parser"""
     
@@ -13,6 +23,7 @@ class ApacheLogParser:
         self.parsed_data = None
         self.raw_lines = []
         self.errors = []
+        self.error_lines = 0
         self.total_lines = 0
         self.parsed_lines = 0
         
@@ -64,6 +75,7 @@ class ApacheLogParser:
                             logs.append(parsed_line)
                             self.parsed_lines += 1
                     except Exception as e:
+                        self.error_lines += 1
                         self.errors.append({
                             'line_number': line_num,
                             'line': line,
@@ -81,6 +93,69 @@ class ApacheLogParser:
         except Exception as e:
             raise Exception(f"Error reading file: {str(e)}")
     
+    def iter_chunks(self, file_path: str, chunksize: int = 50000,
+                    max_errors: int = 1000) -> Iterator[pd.DataFrame]:
+        """Parse the file lazily, yielding DataFrames of at most `chunksize` rows.
+
+        Unlike parse_file, no raw lines are retained (neither `raw_lines` nor a
+        `raw_line` column), timestamps are naive wall-clock time, string
+        columns are categorical, and at most
+        `max_errors` error records are kept, so memory is bounded by the chunk size.
+        """
+        rows = []
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line_num, line in enumerate(f, 1):
+                    self.total_lines += 1
+                    line = line.strip()
+                    
+                    if not line or line.startswith('#'):
+                        continue
+                    
+                    try:
+                        parsed_line = self.parse_line(line)
+                        if parsed_line:
+                            parsed_line['line_number'] = line_num
+                            rows.append(parsed_line)
+                            self.parsed_lines += 1
+                    except Exception as e:
+                        self.error_lines += 1
+                        if len(self.errors) < max_errors:
+                            self.errors.append({
+                                'line_number': line_num,
+                                'line': line,
+                                'error': str(e)
+                            })
+                    
+                    if len(rows) >= chunksize:
+                        yield self._build_chunk(rows)
+                        rows = []
+        except Exception as e:
+            raise Exception(f"Error reading file: {str(e)}")
+        
+        if rows:
+            yield self._build_chunk(rows)
+    
+    def summarize_file(self, file_path: str, chunksize: int = 50000,
+                       top_k_capacity: int = 10000) -> 'ApacheSummary':
+        """Single-pass, constant-memory summary of a (possibly multi-GB) log file"""
+        summary = ApacheSummary(top_k_capacity=top_k_capacity)
+        for chunk in self.iter_chunks(file_path, chunksize=chunksize):
+            summary.merge(ApacheSummary.from_frame(chunk, top_k_capacity=top_k_capacity))
+        return summary
+    
+    def _build_chunk(self, rows: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Turn parsed rows into a compact DataFrame chunk"""
+        df = pd.DataFrame(rows)
+        self._add_computed_columns(df)
+        # Chunks must be comparable with each other, so timestamps are always naive wall-clock
+        if getattr(df['timestamp'].dt, 'tz', None) is not None:
+            df['timestamp'] = df['timestamp'].dt.tz_localize(None)
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        return df
+    
     def parse_line(self, line: str) -> Dict[str, Any]:
         """Parse a single Apache log line"""
         
@@ -317,12 +392,16 @@ class ApacheLogParser:
         
         return analysis
     
-    def _add_computed_columns(self):
-        """Add computed columns to the DataFrame"""
-        if self.parsed_data.empty:
+    def _add_computed_columns(self, df: Optional[pd.DataFrame] = None):
+        """Add computed columns to the DataFrame (parsed_data by default)"""
+        if df is None:
+            df = self.parsed_data
+        if df.empty:
             return
         
-        df = self.parsed_data
+        # Mixed offsets / naive values leave an object column; keep wall-clock time for .dt
+        if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+            df['timestamp'] = pd.to_datetime(df['timestamp'].map(self._wall_clock))
         
         # Add time-based columns
         df['hour'] = df['timestamp'].dt.hour
@@ -341,6 +420,10 @@ class ApacheLogParser:
                                    bins=[0, 1000, 10000, 100000, float('inf')],
                                    labels=['small', 'medium', 'large', 'very_large'])
     
+    def _wall_clock(self, ts: datetime) -> datetime:
+        """Drop the UTC offset, keeping local wall-clock time"""
+        return ts.replace(tzinfo=None) if ts.tzinfo else ts
+    
     def _is_private_ip(self, ip: str) -> bool:
         """Check if IP is in private range"""
         try:
@@ -383,7 +466,7 @@ class ApacheLogParser:
         return {
             'total_lines': self.total_lines,
             'parsed_lines': self.parsed_lines,
-            'error_lines': len(self.errors),
+            'error_lines': self.error_lines,
             'success_rate': round((self.parsed_lines / self.total_lines) * 100, 2) if self.total_lines > 0 else 0,
             'log_type': 'Apache/Nginx Access Log'
         }
@@ -393,59 +476,246 @@ class ApacheLogParser:
         if self.parsed_data is None or self.parsed_data.empty:
             return {'error': 'No data parsed'}
         
-        df = self.parsed_data
+        return ApacheSummary.from_frame(self.parsed_data).to_summary_stats()
+    
+    def get_threat_summary(self) -> Dict[str, Any]:
+        """Get focused threat analysis"""
+        if self.parsed_data is None or self.parsed_data.empty:
+            return {'error': 'No data parsed'}
+        
+        return ApacheSummary.from_frame(self.parsed_data).to_threat_summary()
+
+
+class ApacheSummary:
+    """Mergeable partial aggregate over parsed access-log rows.
+
+    Built per DataFrame chunk with from_frame() (each boolean mask is computed
+    once) and combined with merge(), so a file can be summarised chunk by chunk
+    and files or workers can be combined. High-cardinality fields use sketches
+    (see sketches.py for error bounds): HyperLogLog for unique IPs/URLs,
+    Space-Saving with `top_k_capacity` counters for top IPs/URLs/user agents,
+    and DDSketch for response_size/response_time percentiles.
+    """
+    
+    COUNTERS = [
+        'status', 'method', 'threat_levels', 'attack_types', 'suspicious_ips',
+        'hourly', 'daily', 'file_types', 'threat_by_type', 'attack_timeline'
+    ]
+    TRIMMED = ['suspicious_ips']
+    TOP_K = ['ips', 'urls', 'user_agents']
+    DISTINCT = ['unique_ips', 'unique_urls']
+    QUANTILES = ['response_size', 'response_time']
+    
+    def __init__(self, top_k_capacity: int = 10000, recent_k: int = 10):
+        self.top_k_capacity = top_k_capacity
+        self.recent_k = recent_k
+        self.total = 0
+        self.errors_4xx = 0
+        self.errors_5xx = 0
+        self.errors_total = 0
+        self.suspicious = 0
+        self.high_risk = 0
+        self.start = None
+        self.end = None
+        self.recent_threats = []
+        for name in self.COUNTERS:
+            setattr(self, name, Counter())
+        for name in self.TOP_K:
+            setattr(self, name, SpaceSaving(top_k_capacity))
+        for name in self.DISTINCT:
+            setattr(self, name, HyperLogLog())
+        for name in self.QUANTILES:
+            setattr(self, name, DDSketch())
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, **kwargs) -> 'ApacheSummary':
+        """Aggregate one DataFrame (a chunk or a full parse)"""
+        summary = cls(**kwargs)
+        if df is None or df.empty:
+            return summary
+        
+        status = df['status_code']
+        is_error = status >= 400
+        is_suspicious = df['is_suspicious'] == True
+        suspicious_df = df[is_suspicious]
+        
+        summary.total = len(df)
+        summary.errors_total = int(is_error.sum())
+        summary.errors_4xx = int(status.between(400, 499).sum())
+        summary.errors_5xx = int(status.between(500, 599).sum())
+        summary.suspicious = len(suspicious_df)
+        summary.high_risk = int((suspicious_df['threat_level'] == 'high').sum())
+        summary.start = df['timestamp'].min()
+        summary.end = df['timestamp'].max()
+        
+        summary.status = _counts(status)
+        summary.method = _counts(df['method'])
+        ips = _counts(df['ip'])
+        urls = _counts(df['url'])
+        summary.unique_ips.update(ips)
+        summary.unique_urls.update(urls)
+        summary.ips = SpaceSaving.from_counts(ips, summary.top_k_capacity)
+        summary.urls = SpaceSaving.from_counts(urls, summary.top_k_capacity)
+        summary.user_agents = SpaceSaving.from_counts(_counts(df['user_agent']), summary.top_k_capacity)
+        # Sizes and timings repeat a lot; sketch each distinct value once with its count
+        for name in cls.QUANTILES:
+            if name in df.columns:
+                sketch = getattr(summary, name)
+                for value, count in _counts(df[name]).items():
+                    sketch.add(value, count)
+        summary.threat_levels = _counts(df['threat_level'])
+        summary.hourly = _counts(df['hour'])
+        summary.daily = _counts(df['day_of_week'])
+        summary.file_types = _counts(df['file_extension'])
+        
+        if not suspicious_df.empty:
+            if 'attack_indicators' in df.columns:
+                summary.attack_types = _counts(suspicious_df['attack_indicators'].explode())
+            summary.suspicious_ips = _counts(suspicious_df['ip'])
+            summary.threat_by_type = _counts(suspicious_df['request_type'])
+            summary.attack_timeline = _counts(suspicious_df['timestamp'].dt.hour)
+            recent = suspicious_df.nlargest(summary.recent_k, 'timestamp')
+            summary.recent_threats = recent[['timestamp', 'ip', 'url', 'threat_level']].to_dict('records')
+        
+        summary._trim()
+        return summary
+    
+    def merge(self, other: 'ApacheSummary') -> 'ApacheSummary':
+        """Fold another partial aggregate into this one (in place)"""
+        self.total += other.total
+        self.errors_total += other.errors_total
+        self.errors_4xx += other.errors_4xx
+        self.errors_5xx += other.errors_5xx
+        self.suspicious += other.suspicious
+        self.high_risk += other.high_risk
+        if other.start is not None and (self.start is None or other.start < self.start):
+            self.start = other.start
+        if other.end is not None and (self.end is None or other.end > self.end):
+            self.end = other.end
+        for name in self.COUNTERS:
+            getattr(self, name).update(getattr(other, name))
+        for name in self.TOP_K + self.DISTINCT + self.QUANTILES:
+            getattr(self, name).merge(getattr(other, name))
+        self.recent_threats = heapq.nlargest(
+            self.recent_k, self.recent_threats + other.recent_threats, key=lambda r: r['timestamp']
+        )
+        self._trim()
+        return self
+    
+    def _trim(self):
+        for name in self.TRIMMED:
+            counter = getattr(self, name)
+            if len(counter) > self.top_k_capacity:
+                setattr(self, name, Counter(dict(counter.most_common(self.top_k_capacity))))
+
+    SCALARS = ['total', 'errors_4xx', 'errors_5xx', 'errors_total', 'suspicious', 'high_risk']
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable state, so partial summaries can be persisted and merged later"""
+        data = {name: getattr(self, name) for name in self.SCALARS}
+        data.update({
+            'top_k_capacity': self.top_k_capacity,
+            'recent_k': self.recent_k,
+            'start': self.start.isoformat() if self.start is not None else None,
+            'end': self.end.isoformat() if self.end is not None else None,
+            'recent_threats': [
+                {k: (v.isoformat() if k == 'timestamp' else v) for k, v in r.items()}
+                for r in self.recent_threats
+            ],
+        })
+        # Counter keys may be ints (status, hour), so keep them as pairs
+        for name in self.COUNTERS:
+            data[name] = [[_plain(k), int(v)] for k, v in getattr(self, name).items()]
+        for name in self.TOP_K + self.DISTINCT + self.QUANTILES:
+            data[name] = getattr(self, name).to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ApacheSummary':
+        summary = cls(top_k_capacity=data['top_k_capacity'], recent_k=data['recent_k'])
+        for name in cls.SCALARS:
+            setattr(summary, name, data[name])
+        summary.start = pd.Timestamp(data['start']) if data['start'] else None
+        summary.end = pd.Timestamp(data['end']) if data['end'] else None
+        summary.recent_threats = [
+            dict(r, timestamp=pd.Timestamp(r['timestamp'])) for r in data['recent_threats']
+        ]
+        for name in cls.COUNTERS:
+            setattr(summary, name, Counter({k: v for k, v in data[name]}))
+        for name in cls.TOP_K:
+            setattr(summary, name, SpaceSaving.from_dict(data[name]))
+        for name in cls.DISTINCT:
+            setattr(summary, name, HyperLogLog.from_dict(data[name]))
+        for name in cls.QUANTILES:
+            setattr(summary, name, DDSketch.from_dict(data[name]))
+        return summary
+
+    def to_summary_stats(self) -> Dict[str, Any]:
+        """Same shape as ApacheLogParser.get_summary_stats()"""
+        if not self.total:
+            return {'error': 'No data parsed'}
         
         return {
             'basic_stats': {
-                'total_requests': len(df),
-                'unique_ips': df['ip'].nunique(),
-                'unique_urls': df['url'].nunique(),
+                'total_requests': self.total,
+                'unique_ips': self.unique_ips.count(),
+                'unique_urls': self.unique_urls.count(),
                 'date_range': {
-                    'start': df['timestamp'].min().isoformat(),
-                    'end': df['timestamp'].max().isoformat()
+                    'start': self.start.isoformat(),
+                    'end': self.end.isoformat()
                 }
             },
-            'status_distribution': df['status_code'].value_counts().to_dict(),
-            'method_distribution': df['method'].value_counts().to_dict(),
-            'top_ips': df['ip'].value_counts().head(10).to_dict(),
-            'top_urls': df['url'].value_counts().head(10).to_dict(),
-            'top_user_agents': df['user_agent'].value_counts().head(5).to_dict(),
+            'status_distribution': dict(self.status.most_common()),
+            'method_distribution': dict(self.method.most_common()),
+            'top_ips': dict(self.ips.top(10)),
+            'top_urls': dict(self.urls.top(10)),
+            'top_user_agents': dict(self.user_agents.top(5)),
             'error_analysis': {
-                'total_errors': len(df[df['status_code'] >= 400]),
-                'error_rate': len(df[df['status_code'] >= 400]) / len(df) * 100,
-                '4xx_errors': len(df[df['status_code'].between(400, 499)]),
-                '5xx_errors': len(df[df['status_code'].between(500, 599)])
+                'total_errors': self.errors_total,
+                'error_rate': self.errors_total / self.total * 100,
+                '4xx_errors': self.errors_4xx,
+                '5xx_errors': self.errors_5xx
             },
             'security_analysis': {
-                'suspicious_requests': len(df[df['is_suspicious'] == True]),
-                'threat_levels': df['threat_level'].value_counts().to_dict(),
-                'attack_types': df[df['is_suspicious'] == True]['attack_indicators'].explode().value_counts().to_dict() if 'attack_indicators' in df.columns else {},
-                'suspicious_ips': df[df['is_suspicious'] == True]['ip'].value_counts().head(10).to_dict()
+                'suspicious_requests': self.suspicious,
+                'threat_levels': dict(self.threat_levels.most_common()),
+                'attack_types': dict(self.attack_types.most_common()),
+                'suspicious_ips': dict(self.suspicious_ips.most_common(10))
             },
             'traffic_patterns': {
-                'hourly_distribution': df.groupby('hour').size().to_dict(),
-                'daily_distribution': df.groupby('day_of_week').size().to_dict(),
-                'file_types': df['file_extension'].value_counts().head(10).to_dict()
+                'hourly_distribution': dict(sorted(self.hourly.items())),
+                'daily_distribution': dict(sorted(self.daily.items())),
+                'file_types': dict(self.file_types.most_common(10))
+            },
+            'response_stats': {
+                name: getattr(self, name).summary() for name in self.QUANTILES
             }
         }
     
-    def get_threat_summary(self) -> Dict[str, Any]:
-        """Get focused threat analysis"""
-        if self.parsed_data is None or self.parsed_data.empty:
+    def to_threat_summary(self) -> Dict[str, Any]:
+        """Same shape as ApacheLogParser.get_threat_summary()"""
+        if not self.total:
             return {'error': 'No data parsed'}
-        
-        df = self.parsed_data
-        suspicious_df = df[df['is_suspicious'] == True]
-        
-        if suspicious_df.empty:
+        if not self.suspicious:
             return {'message': 'No threats detected'}
         
         return {
-            'total_threats': len(suspicious_df),
-            'threat_percentage': len(suspicious_df) / len(df) * 100,
-            'threat_by_ip': suspicious_df['ip'].value_counts().head(10).to_dict(),
-            'threat_by_type': suspicious_df['request_type'].value_counts().to_dict(),
-            'high_risk_requests': len(suspicious_df[suspicious_df['threat_level'] == 'high']),
-            'recent_threats': suspicious_df.nlargest(10, 'timestamp')[['timestamp', 'ip', 'url', 'threat_level']].to_dict('records'),
-            'attack_timeline': suspicious_df.groupby(suspicious_df['timestamp'].dt.hour).size().to_dict()
-        }
\ No newline at end of file
+            'total_threats': self.suspicious,
+            'threat_percentage': self.suspicious / self.total * 100,
+            'threat_by_ip': dict(self.suspicious_ips.most_common(10)),
+            'threat_by_type': dict(self.threat_by_type.most_common()),
+            'high_risk_requests': self.high_risk,
+            'recent_threats': self.recent_threats,
+            'attack_timeline': dict(sorted(self.attack_timeline.items()))
+        }
+
+
+def _counts(series: pd.Series) -> Counter:
+    """value_counts() as a Counter, skipping unobserved categories"""
+    vc = series.value_counts()
+    return Counter({k: int(v) for k, v in vc.items() if v > 0})
+
+
+def _plain(value):
+    """numpy scalar -> Python scalar for JSON"""
+    return value.item() if hasattr(value, 'item') else value
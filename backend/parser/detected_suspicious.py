@@ -0,0 +1,267 @@
+# parsers/detected_suspicious.py
+import re
+from collections import OrderedDict, Counter, deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+# -------- auth.log event patterns --------
+RX_SYSLOG_TS = re.compile(r'^(?P<ts>\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})')
+RX_FAILED = re.compile(r'Failed (?:password|publickey) for (?:(?P<invalid>invalid user) )?(?P<user>\S+) from (?P<ip>\S+)')
+RX_ACCEPTED = re.compile(r'Accepted (?:password|publickey|keyboard-interactive\S*) for (?P<user>\S+) from (?P<ip>\S+)')
+RX_INVALID = re.compile(r'Invalid user (?P<user>\S*) from (?P<ip>\S+)')
+RX_SUDO_CMD = re.compile(r'sudo:\s+(?P<user>\S+) : .*COMMAND=')
+RX_SUDO_FAIL = re.compile(r'sudo:\s+(?P<user>\S+) : .*incorrect password attempts')
+RX_SESSION = re.compile(r'session (?P<action>opened|closed) for user (?P<user>[^\s(]+)')
+
+# Default rules: event kind -> (window seconds, threshold)
+DEFAULT_THRESHOLDS = {
+    'ip_failed': (300, 10),          # brute force from one source
+    'ip_invalid_user': (300, 5),     # username enumeration
+    'ip_distinct_users': (300, 5),   # credential stuffing (many accounts, one source)
+    'user_failed': (300, 10),        # one account attacked
+    'user_distinct_ips': (300, 5),   # password spraying / distributed attack on one account
+    'user_sudo': (60, 10),           # burst of privileged commands
+    'user_sudo_failed': (300, 3),
+    'user_session_churn': (60, 20),  # sessions opened/closed in rapid succession
+}
+
+
+class _SlidingWindow:
+    """Event counter over a trailing time window (amortized O(1) per event)"""
+
+    __slots__ = ('window', 'events', 'values')
+
+    def __init__(self, window: int):
+        self.window = window
+        self.events = deque()
+        self.values = Counter()
+
+    def add(self, ts: float, value: Optional[str] = None) -> None:
+        self.events.append((ts, value))
+        if value is not None:
+            self.values[value] += 1
+        self.expire(ts)
+
+    def expire(self, now: float) -> None:
+        cutoff = now - self.window
+        while self.events and self.events[0][0] <= cutoff:
+            _, value = self.events.popleft()
+            if value is not None:
+                self.values[value] -= 1
+                if self.values[value] <= 0:
+                    del self.values[value]
+
+    def count(self) -> int:
+        return len(self.events)
+
+    def distinct(self) -> int:
+        return len(self.values)
+
+
+class SuspiciousActivityDetector:
+    """Streaming brute-force / credential-stuffing detector for auth logs
+
+    Lines are fed one at a time through observe(). Per source IP and per target
+    user, sliding-window counters are kept for each rule; an alert is raised the
+    first time a rule crosses its threshold and re-armed once the window drains.
+    Keys idle for longer than `idle_ttl` seconds (or beyond `max_keys`) are evicted
+    so memory stays bounded on long streams.
+    """
+
+    def __init__(self, thresholds: Optional[Dict[str, tuple]] = None,
+                 idle_ttl: int = 3600, max_keys: int = 50000, max_alerts: int = 1000):
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        if thresholds:
+            self.thresholds.update(thresholds)
+        self.idle_ttl = idle_ttl
+        self.max_keys = max_keys
+        self.max_alerts = max_alerts
+
+        self.ips = OrderedDict()    # ip -> {'last_seen', 'windows', 'armed'}
+        self.users = OrderedDict()  # user -> same shape
+        self.alerts = []            # first `max_alerts` alerts only
+        self.alert_total = 0
+        self.alerts_by_rule = Counter()
+        self.event_counts = Counter()
+        self.total_lines = 0
+        self.evicted_keys = 0
+        self._now = 0.0
+        self._year = datetime.now().year
+
+    # ---------- input ----------
+    def observe(self, line: str, timestamp: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Consume one raw auth.log line; return alerts raised by it"""
+        self.total_lines += 1
+        event = self._classify(line)
+        if event is None:
+            return []
+
+        ts = self._event_time(line, timestamp)
+        kind, user, ip = event
+        self.event_counts[kind] += 1
+
+        raised = []
+        if kind == 'failed':
+            raised += self._hit(self.ips, ip, 'ip_failed', ts, key_type='ip')
+            raised += self._hit(self.ips, ip, 'ip_distinct_users', ts, value=user, key_type='ip')
+            raised += self._hit(self.users, user, 'user_failed', ts, key_type='user')
+            raised += self._hit(self.users, user, 'user_distinct_ips', ts, value=ip, key_type='user')
+        elif kind == 'invalid_user':
+            raised += self._hit(self.ips, ip, 'ip_invalid_user', ts, key_type='ip')
+        elif kind == 'accepted':
+            raised += self._check_success_after_failure(ip, user, ts)
+        elif kind == 'sudo':
+            raised += self._hit(self.users, user, 'user_sudo', ts, key_type='user')
+        elif kind == 'sudo_failed':
+            raised += self._hit(self.users, user, 'user_sudo_failed', ts, key_type='user')
+        elif kind == 'session':
+            raised += self._hit(self.users, user, 'user_session_churn', ts, key_type='user')
+
+        self._evict(ts)
+        return raised
+
+    def observe_many(self, lines) -> List[Dict[str, Any]]:
+        raised = []
+        for line in lines:
+            raised.extend(self.observe(line))
+        return raised
+
+    # ---------- output ----------
+    def get_summary(self) -> Dict[str, Any]:
+        """Summary suitable for the /upload response"""
+        return {
+            'total_lines': self.total_lines,
+            'auth_events': dict(self.event_counts),
+            'alert_count': self.alert_total,
+            'alerts_by_rule': dict(self.alerts_by_rule),
+            'alerts_truncated': self.alert_total > len(self.alerts),
+            'alerts': self.alerts,
+            'tracked_ips': len(self.ips),
+            'tracked_users': len(self.users),
+            'evicted_keys': self.evicted_keys,
+        }
+
+    # ---------- internals ----------
+    def _classify(self, line: str):
+        """Map a line to (kind, user, ip) or None"""
+        if 'sshd' in line:
+            m = RX_FAILED.search(line)
+            if m:
+                return ('failed', m.group('user'), m.group('ip'))
+            m = RX_INVALID.search(line)
+            if m:
+                return ('invalid_user', m.group('user') or '', m.group('ip'))
+            m = RX_ACCEPTED.search(line)
+            if m:
+                return ('accepted', m.group('user'), m.group('ip'))
+        if 'sudo' in line:
+            m = RX_SUDO_FAIL.search(line)
+            if m:
+                return ('sudo_failed', m.group('user'), '')
+            m = RX_SUDO_CMD.search(line)
+            if m:
+                return ('sudo', m.group('user'), '')
+        m = RX_SESSION.search(line)
+        if m:
+            return ('session', m.group('user'), '')
+        return None
+
+    def _event_time(self, line: str, timestamp: Optional[datetime]) -> float:
+        """Seconds since epoch; syslog lines lack a year so the current one is assumed"""
+        if timestamp is None:
+            m = RX_SYSLOG_TS.match(line)
+            if m:
+                try:
+                    ts_str = ' '.join(m.group('ts').split())
+                    timestamp = datetime.strptime(f"{self._year} {ts_str}", '%Y %b %d %H:%M:%S')
+                except ValueError:
+                    timestamp = None
+        ts = timestamp.timestamp() if timestamp else self._now
+        # Keep the clock monotonic so out-of-order lines cannot rewind windows
+        self._now = max(self._now, ts)
+        return self._now
+
+    def _state(self, table: OrderedDict, key: str, ts: float) -> Dict[str, Any]:
+        state = table.get(key)
+        if state is None:
+            state = {'last_seen': ts, 'windows': {}, 'armed': set()}
+            table[key] = state
+        else:
+            state['last_seen'] = ts
+            table.move_to_end(key)
+        return state
+
+    def _window(self, state: Dict[str, Any], rule: str) -> _SlidingWindow:
+        win = state['windows'].get(rule)
+        if win is None:
+            win = _SlidingWindow(self.thresholds[rule][0])
+            state['windows'][rule] = win
+        return win
+
+    def _hit(self, table: OrderedDict, key: str, rule: str, ts: float,
+             value: Optional[str] = None, key_type: str = 'ip') -> List[Dict[str, Any]]:
+        if not key:
+            return []
+        state = self._state(table, key, ts)
+        win = self._window(state, rule)
+        win.add(ts, value)
+
+        threshold = self.thresholds[rule][1]
+        observed = win.distinct() if '_distinct_' in rule else win.count()
+
+        if observed < threshold:
+            state['armed'].discard(rule)
+            if rule == 'ip_failed':
+                state['armed'].discard('success_after_failures')
+            return []
+        if rule in state['armed']:
+            return []
+        state['armed'].add(rule)
+        return [self._raise(rule, key_type, key, observed, ts,
+                            sorted(win.values)[:10] if value is not None else None)]
+
+    def _check_success_after_failure(self, ip: str, user: str, ts: float) -> List[Dict[str, Any]]:
+        state = self.ips.get(ip)
+        if not state or 'ip_failed' not in state['windows']:
+            return []
+        win = state['windows']['ip_failed']
+        win.expire(ts)
+        if win.count() < self.thresholds['ip_failed'][1]:
+            # Failures have drained out of the window; re-arm like the other rules
+            state['armed'].discard('success_after_failures')
+            return []
+        if 'success_after_failures' in state['armed']:
+            return []
+        self._state(self.ips, ip, ts)['armed'].add('success_after_failures')
+        return [self._raise('success_after_failures', 'ip', ip, win.count(), ts, [user])]
+
+    def _raise(self, rule: str, key_type: str, key: str, observed: int, ts: float,
+               related: Optional[List[str]] = None) -> Dict[str, Any]:
+        window, threshold = self.thresholds.get(rule, self.thresholds['ip_failed'])
+        alert = {
+            'rule': rule,
+            'severity': 'high' if rule in ('success_after_failures', 'ip_distinct_users', 'user_distinct_ips') else 'medium',
+            key_type: key,
+            'count': observed,
+            'threshold': threshold,
+            'window_seconds': window,
+            'timestamp': datetime.fromtimestamp(ts).isoformat() if ts else '',
+        }
+        if related:
+            alert['related'] = related
+        self.alert_total += 1
+        self.alerts_by_rule[rule] += 1
+        if len(self.alerts) < self.max_alerts:
+            self.alerts.append(alert)
+        return alert
+
+    def _evict(self, now: float) -> None:
+        """Drop least-recently-seen keys that are idle or over the size cap"""
+        for table in (self.ips, self.users):
+            while table:
+                key, state = next(iter(table.items()))
+                if now - state['last_seen'] > self.idle_ttl or len(table) > self.max_keys:
+                    table.popitem(last=False)
+                    self.evicted_keys += 1
+                else:
+                    break
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import re
+import threading
+import zlib
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# "google" (remote models/embedding-001) or "local" (HashingEmbeddings, CPU only)
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "google").lower()
+EMBEDDING_DIM = 768  # matches models/embedding-001, so either backend fits the same index shape
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+
+RX_DIGITS = re.compile(r'\d+')
+RX_WORD = re.compile(r'[a-z_][a-z0-9_.\-/]*')
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+class HashingEmbeddings(Embeddings):
+    """Offline CPU embedder: hashed n-gram features, randomly projected to `dimension`
+
+    Features are character 3- and 4-grams plus word tokens of the lowercased
+    line, with digit runs collapsed (so ports, pids and timestamps don't
+    dominate). Each feature hash is mapped by a sparse random projection
+    (`hashes` signed entries per feature, as in sparse Johnson-Lindenstrauss)
+    onto `dimension` outputs, and rows are L2-normalized for cosine search.
+    Nothing is fitted, so vectors are stable across processes and restarts.
+    """
+
+    def __init__(self, dimension: int = EMBEDDING_DIM, hashes: int = 4, seed: int = 7):
+        self.dimension = dimension
+        self.hashes = hashes
+        rng = np.random.default_rng(seed)
+        # Odd multipliers for multiply-shift hashing, one per projection entry
+        self._mult = rng.integers(1, 2 ** 63, size=hashes, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._add = rng.integers(0, 2 ** 63, size=hashes, dtype=np.uint64)
+
+    @property
+    def model_name(self) -> str:
+        return f"hashing-v1-{self.dimension}-{self.hashes}"
+
+    @staticmethod
+    def _features(text: str) -> np.ndarray:
+        text = RX_DIGITS.sub("0", text.lower())
+        data = np.frombuffer(text.encode("utf-8", errors="ignore"), dtype=np.uint8).astype(np.uint64)
+        keys = []
+        if len(data) >= 3:
+            tri = (data[:-2] << np.uint64(16)) | (data[1:-1] << np.uint64(8)) | data[2:]
+            keys.append(tri | np.uint64(3 << 40))
+        if len(data) >= 4:
+            quad = (data[:-3] << np.uint64(24)) | (data[1:-2] << np.uint64(16)) | (data[2:-1] << np.uint64(8)) | data[3:]
+            keys.append(quad | np.uint64(4 << 40))
+        words = RX_WORD.findall(text)
+        if words:
+            keys.append(np.array([zlib.crc32(w.encode("utf-8")) for w in words], dtype=np.uint64) | np.uint64(1 << 48))
+        return np.concatenate(keys) if keys else np.empty(0, dtype=np.uint64)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Vectorized batch encoding -> float32 array of shape (len(texts), dimension)"""
+        feats = [self._features(t) for t in texts]
+        lengths = np.array([len(f) for f in feats], dtype=np.int64)
+        out = np.zeros(len(texts) * self.dimension, dtype=np.float64)
+        if lengths.sum():
+            keys = np.concatenate(feats)
+            rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths) * self.dimension
+            with np.errstate(over="ignore"):
+                for mult, add in zip(self._mult, self._add):
+                    h = (keys * mult + add) & _MASK64
+                    dims = (h >> np.uint64(33)).astype(np.int64) % self.dimension
+                    signs = np.where(h & np.uint64(1 << 32), 1.0, -1.0)
+                    out += np.bincount(rows + dims, weights=signs, minlength=out.size)
+        vecs = out.reshape(len(texts), self.dimension)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vecs / norms).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """Disk cache of vectors keyed by sha256(model, kind, text), around any Embeddings
+
+    Misses are embedded in batches of `batch_size`. One float32 file per key,
+    sharded by the first two hex digits; file mtime is the LRU clock, as in
+    llm_cache.LLMResponseCache. The entry count is kept in memory (one scan on
+    the first miss) so the shards are only swept once it passes max_entries,
+    and a sweep goes down to EVICT_TO of the limit so the next one is far off.
+    """
+
+    EVICT_TO = 0.9
+
+    def __init__(self, base: Embeddings, model_name: str, cache_dir: str = EMBEDDING_CACHE_DIR,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.base = base
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.batch_size = max(batch_size, 1)
+        self.hits = 0
+        self.misses = 0
+        self._entries = None  # approximate; other processes' writes show up at the next sweep
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, kind: str, text: str) -> str:
+        raw = f"{self.model_name}\0{kind}\0{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.f32")
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        path = self._path(key)
+        try:
+            vec = np.fromfile(path, dtype=np.float32)
+        except (OSError, ValueError):
+            return None
+        if not vec.size:
+            return None
+        os.utime(path)  # touch for LRU
+        return vec.tolist()
+
+    def _put(self, key: str, vec: List[float]) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        np.asarray(vec, dtype=np.float32).tofile(tmp)
+        os.replace(tmp, path)
+        if self._entries is None:
+            self._entries = len(self._scan())
+        else:
+            self._entries += 1
+        if self._entries > self.max_entries:
+            self.evict()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("d", t) for t in texts]
+        vectors = [self._get(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            for i, vec in zip(batch, self.base.embed_documents([texts[i] for i in batch])):
+                vectors[i] = list(vec)
+                self._put(keys[i], vectors[i])
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("q", text)
+        vec = self._get(key)
+        if vec is None:
+            vec = list(self.base.embed_query(text))
+            self._put(key, vec)
+        return vec
+
+    def _scan(self) -> List[tuple]:
+        """(mtime, path) of every cached vector"""
+        entries = []
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith(".f32"):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        return entries
+
+    def evict(self) -> int:
+        """Remove least-recently-used vectors, down to EVICT_TO of max_entries
+        once the cache holds more than max_entries"""
+        entries = self._scan()
+        excess = 0
+        if len(entries) > self.max_entries:
+            excess = len(entries) - int(self.max_entries * self.EVICT_TO)
+        removed = 0
+        for _, path in sorted(entries)[:max(excess, 0)]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        self._entries = len(entries) - removed
+        return removed
+
+
+def get_embeddings(backend: Optional[str] = None, cache: Optional[bool] = None) -> Embeddings:
+    """Embeddings used by rag/vector.py and rag/retrieval.py
+
+    The disk cache is on by default for the remote backend only; the local
+    embedder is faster than reading its vectors back from disk.
+    Switching backends changes the vector space, so point PINECONE_INDEX_NAME at a
+    separate index when changing EMBEDDINGS_BACKEND.
+    """
+    backend = (backend or EMBEDDINGS_BACKEND).lower()
+    if backend == "local":
+        base = HashingEmbeddings()
+        name = base.model_name
+    elif backend == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        name = "models/embedding-001"
+        base = GoogleGenerativeAIEmbeddings(
+            model=name,
+            google_api_key=os.getenv("GEMINI_API_KEY"),
+        )
+    else:
+        raise ValueError(f"Unknown EMBEDDINGS_BACKEND: {backend}")
+    if cache is None:
+        cache = backend != "local"
+    return CachedEmbeddings(base, name) if cache else base
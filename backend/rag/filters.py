@@ -0,0 +1,199 @@
+import ipaddress
+import re
+from typing import Dict, Any, Optional, List
+
+from log_parser import wall_clock_epoch
+
+# Candidate addresses in a log line, validated by extract_ips(); the token must stand
+# alone, so version strings like "amd64~~6.1.1.0" or "v1.2.3.4" are skipped
+RX_IPV4 = re.compile(r'(?<![\w.~-])\d{1,3}(?:\.\d{1,3}){3}(?![\w.~-])')
+RX_IPV6 = re.compile(r'(?<![\w:.~-])[0-9A-Fa-f]{0,4}(?::[0-9A-Fa-f]{0,4}){2,7}(?![\w:.~-])')
+
+THIS_NETWORK = ipaddress.ip_network("0.0.0.0/8")
+
+RX_Q_IP = re.compile(r'\b(\d{1,3}(?:\.\d{1,3}){3})\b')
+RX_Q_CLUSTER = re.compile(r'\b(?:cluster|template)(?:\s+id)?\s*#?\s*(\d+)\b', re.I)
+RX_Q_DATE = re.compile(r'\b(\d{4}-\d{2}-\d{2})\b')
+RX_Q_CLOCK = r'(\d{1,2}:\d{2}(?::\d{2})?)'
+RX_Q_BETWEEN = re.compile(r'\bbetween\s+' + RX_Q_CLOCK + r'\s+and\s+' + RX_Q_CLOCK, re.I)
+RX_Q_AFTER = re.compile(r'\b(?:after|since|from)\s+' + RX_Q_CLOCK, re.I)
+RX_Q_BEFORE = re.compile(r'\b(?:before|until|till|to)\s+' + RX_Q_CLOCK, re.I)
+
+LEVEL_WORDS = {
+    "ERROR": ["ERROR"], "ERRORS": ["ERROR"],
+    "WARN": ["WARN", "WARNING"], "WARNING": ["WARN", "WARNING"], "WARNINGS": ["WARN", "WARNING"],
+    "CRITICAL": ["CRITICAL"], "FATAL": ["FATAL"],
+}
+RX_Q_LEVEL = re.compile(r'\b(' + "|".join(LEVEL_WORDS) + r')\b', re.I)
+
+
+def extract_ips(line: str) -> List[str]:
+    """Valid IPv4/IPv6 addresses in a line, in order of appearance
+
+    Stricter than log_parser's best-effort `ip` field (which also picks up
+    clock times and hex-like words), so it can back the `ip` filter. 0.0.0.0/8
+    is never a host address and in practice is a version number ("version 0.0.0.6").
+    """
+    ips = []
+    for rx in (RX_IPV4, RX_IPV6):
+        for m in rx.finditer(line):
+            try:
+                addr = ipaddress.ip_address(m.group(0))
+            except ValueError:
+                continue
+            if addr.is_unspecified or (addr.version == 4 and addr in THIS_NETWORK):
+                continue
+            if str(addr) not in ips:
+                ips.append(str(addr))
+    return ips
+
+
+def _seconds_of_day(clock: str) -> int:
+    parts = [int(p) for p in clock.split(":")] + [0]
+    return parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+
+def extract_filters(question: str) -> Dict[str, Any]:
+    """Cheap rule-based filter extraction, e.g.
+    "errors from 10.0.0.5 after 04:50" -> {"level": ["ERROR"], "ip": "10.0.0.5", "after": "04:50"}
+    """
+    filters = {}
+
+    m = RX_Q_IP.search(question)
+    if m:
+        filters["ip"] = m.group(1)
+
+    m = RX_Q_CLUSTER.search(question)
+    if m:
+        filters["cluster_id"] = int(m.group(1))
+
+    levels = []
+    for word in RX_Q_LEVEL.findall(question):
+        levels += [lvl for lvl in LEVEL_WORDS[word.upper()] if lvl not in levels]
+    if levels:
+        filters["level"] = levels
+
+    m = RX_Q_DATE.search(question)
+    date = m.group(1) if m else None
+
+    m = RX_Q_BETWEEN.search(question)
+    after = m.group(1) if m else None
+    before = m.group(2) if m else None
+    if not m:
+        m = RX_Q_AFTER.search(question)
+        after = m.group(1) if m else None
+        m = RX_Q_BEFORE.search(question)
+        before = m.group(1) if m else None
+
+    if date:
+        # A date makes the range absolute
+        filters["start"] = f"{date} {after or '00:00'}:00"[:19]
+        if before:
+            filters["end"] = f"{date} {before}:00"[:19]
+        elif not after:
+            filters["end"] = f"{date} 23:59:59"
+    else:
+        if after:
+            filters["after"] = after
+        if before:
+            filters["before"] = before
+    return filters
+
+
+def merge_filters(explicit: Optional[Dict[str, Any]], question: str) -> Dict[str, Any]:
+    """Filters from the question text, overridden by any passed explicitly"""
+    filters = extract_filters(question or "")
+    for key, value in (explicit or {}).items():
+        if value not in (None, "", []):
+            filters[key] = value
+    return filters
+
+
+def _as_list(value) -> List:
+    return value if isinstance(value, list) else [value]
+
+
+RX_CLOCK = re.compile(r'^(\d{1,2}):(\d{2})(?::(\d{2}))?$')
+
+
+def _strings(key: str, value) -> List[str]:
+    values = _as_list(value)
+    if not all(isinstance(v, str) and v.strip() for v in values):
+        raise ValueError(f"filters.{key} must be a string or a list of strings")
+    return [v.strip() for v in values]
+
+
+def _single(key: str, values: List):
+    return values[0] if len(values) == 1 else values
+
+
+def validate_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Check and normalize explicit filters (e.g. from a /query body)
+
+    Raises ValueError with a message fit for the client on unknown keys or
+    malformed values; empty values are dropped, as merge_filters ignores them.
+    """
+    clean = {}
+    for key, value in filters.items():
+        if value in (None, "", []):
+            continue
+        if key in ("level", "source"):
+            clean[key] = _single(key, _strings(key, value))
+        elif key == "ip":
+            ips = []
+            for v in _strings(key, value):
+                try:
+                    ips.append(str(ipaddress.ip_address(v)))
+                except ValueError:
+                    raise ValueError(f"filters.ip: invalid address {v!r}")
+            clean[key] = _single(key, ips)
+        elif key == "cluster_id":
+            ids = []
+            for v in _as_list(value):
+                if isinstance(v, bool) or not isinstance(v, (int, str)) or not str(v).strip().lstrip("-").isdigit():
+                    raise ValueError("filters.cluster_id must be an integer or a list of integers")
+                ids.append(int(v))
+            clean[key] = _single(key, ids)
+        elif key in ("start", "end"):
+            if not isinstance(value, str) or wall_clock_epoch(value) is None:
+                raise ValueError(f"filters.{key} must be a timestamp like 2024-03-06 06:31:00")
+            clean[key] = value
+        elif key in ("after", "before"):
+            m = RX_CLOCK.match(value) if isinstance(value, str) else None
+            if not m or int(m.group(1)) > 23 or int(m.group(2)) > 59 or int(m.group(3) or 0) > 59:
+                raise ValueError(f"filters.{key} must be a time of day like 04:50")
+            clean[key] = value
+        else:
+            raise ValueError(f"Unknown filter: {key}")
+    return clean
+
+
+def to_pinecone_filter(filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Translate filters into a Pinecone metadata filter expression"""
+    clauses = []
+
+    for key in ("level", "source", "ip"):
+        if filters.get(key):
+            values = [str(v).upper() if key == "level" else str(v) for v in _as_list(filters[key])]
+            clauses.append({key: {"$in": values}} if len(values) > 1 else {key: {"$eq": values[0]}})
+
+    if filters.get("cluster_id") is not None:
+        clauses.append({"cluster_id": {"$in": [str(int(c)) for c in _as_list(filters["cluster_id"])]}})
+
+    # A chunk matches a time range when its [ts, ts_end] span overlaps it
+    if filters.get("start"):
+        start = wall_clock_epoch(str(filters["start"]))
+        if start is not None:
+            clauses.append({"ts_end": {"$gte": start}})
+    if filters.get("end"):
+        end = wall_clock_epoch(str(filters["end"]))
+        if end is not None:
+            clauses.append({"ts": {"$lte": end}})
+    if filters.get("after"):
+        clauses.append({"tod_end": {"$gte": _seconds_of_day(str(filters["after"]))}})
+    if filters.get("before"):
+        clauses.append({"tod": {"$lte": _seconds_of_day(str(filters["before"]))}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -2,8 +2,13 @@ from typing import List, Dict
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from .vector import get_vectorstore
+from .pipeline import UpsertPipeline, IngestCheckpoint
+from .embeddings import EMBEDDINGS_BACKEND
+from log_parser import wall_clock_epoch
+from .filters import extract_ips
 import hashlib
 import asyncio
+import os
 
 def build_documents(parsed_logs: List[Dict]) -> List[Document]:
     docs = []
@@ -16,17 +21,89 @@ def build_documents(parsed_logs: List[Dict]) -> List[Document]:
             "source": log.get("source", "Unknown"),
             "level": log.get("level", ""),
             "raw": log.get("raw", ""),
+            # Validated addresses only; log["ip"] is best-effort and often a clock time
+            "ip": extract_ips(content),
+            "cluster_id": int(log.get("cluster_id", -1)),
             "oid": str(i)  # original index within batch (optional)
         }
+        # Numeric time fields for filter pushdown (see rag/filters.py); Pinecone rejects nulls
+        ts = wall_clock_epoch(metadata["timestamp"])
+        if ts is not None:
+            metadata["ts"] = ts
+            metadata["tod"] = ts % 86400
         # this text is what will be embedded/searched
         docs.append(Document(page_content=content, metadata=metadata))
     return docs
 
+CHUNK_SIZE = 600
+PACK_WINDOW_SECONDS = 300
+
+
+def _unique(values: List[str]) -> List[str]:
+    return [v for v in dict.fromkeys(values) if v]
+
+
+def _pack(group: List[Document]) -> Document:
+    """Merge consecutive single-line docs into one chunk with range metadata"""
+    first, last = group[0].metadata, group[-1].metadata
+    stamps = [d.metadata["ts"] for d in group if "ts" in d.metadata]
+    metadata = {
+        "timestamp": first["timestamp"] or next((d.metadata["timestamp"] for d in group if d.metadata["timestamp"]), ""),
+        "timestamp_end": next((d.metadata["timestamp"] for d in reversed(group) if d.metadata["timestamp"]), ""),
+        "source": first["source"],
+        # Pinecone list metadata must be strings; filters match any element
+        "level": _unique([d.metadata["level"] for d in group]),
+        "ip": _unique([ip for d in group for ip in d.metadata["ip"]]),
+        "cluster_id": _unique([str(d.metadata["cluster_id"]) for d in group]),
+        "raw": "",
+        "line_start": int(first["oid"]),
+        "line_end": int(last["oid"]),
+        "lines": len(group),
+        "oid": first["oid"],
+    }
+    if stamps:
+        metadata["ts"] = min(stamps)
+        metadata["ts_end"] = max(stamps)
+        metadata["tod"] = metadata["ts"] % 86400
+        metadata["tod_end"] = metadata["ts_end"] % 86400
+    return Document(page_content="\n".join(d.page_content for d in group), metadata=metadata)
+
+
+def pack_documents(docs: List[Document], chunk_size: int = CHUNK_SIZE,
+                   window_seconds: int = PACK_WINDOW_SECONDS) -> List[Document]:
+    """
+    Group consecutive lines from the same source and time window into chunks
+    close to `chunk_size` characters, so each vector carries neighbouring events.
+    """
+    packed = []
+    group = []
+    size = 0
+    window_start = None
+    for doc in docs:
+        ts = doc.metadata.get("ts")
+        length = len(doc.page_content) + 1
+        if group and (
+            doc.metadata["source"] != group[0].metadata["source"]
+            or size + length > chunk_size
+            or (ts is not None and window_start is not None and ts - window_start > window_seconds)
+        ):
+            packed.append(_pack(group))
+            group, size, window_start = [], 0, None
+        group.append(doc)
+        size += length
+        if window_start is None:
+            window_start = ts
+    if group:
+        packed.append(_pack(group))
+    return packed
+
+
 def chunk_documents(docs: List[Document]) -> List[Document]:
+    # Only single lines longer than the chunk size still need splitting
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=600, chunk_overlap=60, separators=["\n", " ", ""]
+        chunk_size=CHUNK_SIZE, chunk_overlap=60, separators=["\n", " ", ""]
     )
-    return splitter.split_documents(docs)
+    return splitter.split_documents(pack_documents(docs))
 
 
 def make_doc_id(content: str, metadata: dict) -> str:
@@ -35,7 +112,12 @@ def make_doc_id(content: str, metadata: dict) -> str:
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
-def ingest_parsed_logs(parsed_logs: List[Dict]) -> int:
+def ingest_parsed_logs(parsed_logs: List[Dict], vs=None, pipeline: UpsertPipeline = None) -> int:
+    """Chunk, embed and upsert parsed logs in checkpointed concurrent batches
+
+    Raises pipeline.IngestError if a batch still fails after retries; calling
+    again with the same logs resumes from the checkpoint.
+    """
     docs = build_documents(parsed_logs)
     if not docs:
         return 0
@@ -46,12 +128,15 @@ def ingest_parsed_logs(parsed_logs: List[Dict]) -> int:
         asyncio.get_running_loop()
     except RuntimeError:
         asyncio.set_event_loop(asyncio.new_event_loop())
-    vs = get_vectorstore()
+    if vs is None:
+        vs = get_vectorstore()
 
     # Generate IDs for each chunk
     ids = [make_doc_id(doc.page_content, doc.metadata) for doc in chunks]
 
-    # Insert into Pinecone (skip duplicates)
-    vs.add_documents(chunks, ids=ids)
+    # Upsert into Pinecone (same ids overwrite, so retries never duplicate)
+    target = os.getenv("PINECONE_INDEX_NAME", "logchat-index") + "/" + EMBEDDINGS_BACKEND
+    checkpoint = IngestCheckpoint(IngestCheckpoint.job_id(ids, target))
+    (pipeline or UpsertPipeline(vs)).run(chunks, ids, checkpoint=checkpoint)
 
-    return len(chunks)
\ No newline at end of file
+    return len(chunks)
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Set
+
+from langchain_core.documents import Document
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+INGEST_MIN_BATCH_SIZE = int(os.getenv("INGEST_MIN_BATCH_SIZE", "10"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+INGEST_BACKOFF_BASE = float(os.getenv("INGEST_BACKOFF_BASE", "0.5"))
+INGEST_BACKOFF_MAX = float(os.getenv("INGEST_BACKOFF_MAX", "30"))
+INGEST_CHECKPOINT_DIR = os.getenv("INGEST_CHECKPOINT_DIR", "ingest_checkpoints")
+
+# Substrings of errors raised by Pinecone / Google APIs when they throttle us
+THROTTLE_MARKERS = ("429", "rate limit", "ratelimit", "too many requests", "quota",
+                    "resource exhausted", "resource_exhausted", "throttl")
+
+
+class IngestError(Exception):
+    """Ingest stopped after retries; chunks upserted so far are checkpointed"""
+
+    def __init__(self, upserted: int, total: int, cause: Exception):
+        super().__init__(f"ingested {upserted}/{total} chunks before failing: {cause}")
+        self.upserted = upserted
+        self.total = total
+        self.cause = cause
+
+
+def is_throttle_error(e: Exception) -> bool:
+    if getattr(e, "status", None) == 429 or getattr(e, "status_code", None) == 429:
+        return True
+    text = f"{type(e).__name__} {e}".lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+def _ensure_event_loop() -> None:
+    # Google's LangChain clients expect an event loop in the calling thread
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+
+class _BatchSizer:
+    """AIMD batch size: halve on throttling, grow back by a tenth of the max per success"""
+
+    def __init__(self, size: int, min_size: int):
+        self.max_size = max(size, 1)
+        self.min_size = max(min(min_size, self.max_size), 1)
+        self.size = self.max_size
+        self._step = max(self.max_size // 10, 1)
+        self._lock = threading.Lock()
+
+    def shrink(self) -> None:
+        with self._lock:
+            self.size = max(self.size // 2, self.min_size)
+
+    def grow(self) -> None:
+        with self._lock:
+            self.size = min(self.size + self._step, self.max_size)
+
+
+class IngestCheckpoint:
+    """Append-only record of chunk ids already upserted for one ingest job
+
+    A job is identified by its chunk ids and target index, so re-running the
+    same upload after a failure only sends the chunks that are missing.
+    """
+
+    def __init__(self, job_id: str, checkpoint_dir: str = INGEST_CHECKPOINT_DIR):
+        if not job_id.isalnum():
+            raise ValueError("Invalid job id")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.path = os.path.join(checkpoint_dir, f"{job_id}.ids")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def job_id(ids: List[str], target: str = "") -> str:
+        h = hashlib.sha256(target.encode("utf-8"))
+        for doc_id in ids:
+            h.update(doc_id.encode("utf-8"))
+        return h.hexdigest()
+
+    def load(self) -> Set[str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return {line.strip() for line in f if line.strip()}
+        except OSError:
+            return set()
+
+    def record(self, ids: List[str]) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{doc_id}\n" for doc_id in ids))
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class UpsertPipeline:
+    """Batched, concurrent embed+upsert into a LangChain vector store
+
+    Batches go through `vs.add_documents` (which embeds them) on a bounded
+    thread pool; at most `workers` batches are in flight, so a slow backend
+    holds the producer back instead of queueing the whole upload. Failed
+    batches are retried with exponential backoff and full jitter; throttling
+    errors also shrink the batch size for the batches that follow.
+    """
+
+    def __init__(self, vs, batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS,
+                 max_retries: int = INGEST_MAX_RETRIES, min_batch_size: int = INGEST_MIN_BATCH_SIZE,
+                 backoff_base: float = INGEST_BACKOFF_BASE, backoff_max: float = INGEST_BACKOFF_MAX):
+        self.vs = vs
+        self.workers = max(workers, 1)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sizer = _BatchSizer(batch_size, min_batch_size)
+        self._stats_lock = threading.Lock()
+        self.stats = {"batches": 0, "retries": 0, "throttled": 0}
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _upsert(self, docs: List[Document], ids: List[str]) -> int:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.vs.add_documents(docs, ids=ids)
+                self._count("batches")
+                return len(docs)
+            except Exception as e:
+                if is_throttle_error(e):
+                    self._count("throttled")
+                    self.sizer.shrink()
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                time.sleep(self._backoff(attempt))
+        return 0
+
+    def run(self, docs: List[Document], ids: List[str],
+            checkpoint: Optional[IngestCheckpoint] = None) -> Dict[str, Any]:
+        done = checkpoint.load() if checkpoint else set()
+        pending = [(doc, doc_id) for doc, doc_id in zip(docs, ids) if doc_id not in done]
+        skipped = len(docs) - len(pending)
+
+        started = time.time()
+        upserted = 0
+        failure = None
+        pos = 0
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers, initializer=_ensure_event_loop) as pool:
+            while in_flight or (pos < len(pending) and failure is None):
+                while failure is None and pos < len(pending) and len(in_flight) < self.workers:
+                    batch = pending[pos:pos + self.sizer.size]
+                    pos += len(batch)
+                    fut = pool.submit(self._upsert, [d for d, _ in batch], [i for _, i in batch])
+                    in_flight[fut] = batch
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    batch = in_flight.pop(fut)
+                    try:
+                        upserted += fut.result()
+                    except Exception as e:
+                        # Let in-flight batches finish (and checkpoint), schedule nothing new
+                        failure = failure or e
+                        continue
+                    if checkpoint:
+                        checkpoint.record([i for _, i in batch])
+                    self.sizer.grow()
+
+        elapsed = time.time() - started
+        if failure is not None:
+            raise IngestError(skipped + upserted, len(docs), failure)
+        if checkpoint:
+            checkpoint.clear()
+        return dict(
+            self.stats,
+            total=len(docs),
+            upserted=upserted,
+            skipped=skipped,
+            seconds=round(elapsed, 3),
+            chunks_per_s=round(upserted / elapsed, 1) if elapsed else 0.0,
+            batch_size=self.sizer.size,
+        )
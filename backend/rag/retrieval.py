@@ -1,21 +1,29 @@
 import os
-from typing import Dict, Any
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from typing import Dict, Any, Optional
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from .schema import QAResponse
 from .vector import get_vectorstore
+from .embeddings import get_embeddings
+from .filters import merge_filters, to_pinecone_filter
 import asyncio
 
 def _format_docs(docs) -> str:
-    lines = []
+    blocks = []
     for d in docs:
         ts = d.metadata.get("timestamp", "")
+        ts_end = d.metadata.get("timestamp_end", "")
         src = d.metadata.get("source", "")
         lvl = d.metadata.get("level", "")
-        txt = d.page_content.strip().replace("\n", " ")
-        lines.append(f"[{ts}] [{src}] [{lvl}] {txt}")
-    return "\n".join(lines)
+        if isinstance(lvl, list):
+            lvl = ",".join(lvl)
+        span = f"{ts} .. {ts_end}" if ts_end and ts_end != ts else ts
+        if "line_start" in d.metadata:
+            span += f" lines {int(d.metadata['line_start']) + 1}-{int(d.metadata['line_end']) + 1}"
+        # Packed chunks keep one log line per row so neighbouring events stay readable
+        blocks.append(f"[{span}] [{src}] [{lvl}]\n{d.page_content.strip()}")
+    return "\n\n".join(blocks)
 
 
 def build_chain():
@@ -46,23 +54,39 @@ def build_chain():
     return prompt | llm | parser
 
 
-def answer_question(question: str, k: int = 8) -> Dict[str, Any]:
+def answer_question(question: str, k: int = 8, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    filters: optional structured filters (start/end, after/before, level, source, ip,
+    cluster_id); merged with those parsed from the question and pushed into the
+    vector store query as a metadata filter.
+    """
+    applied = merge_filters(filters, question)
+    metadata_filter = to_pinecone_filter(applied)
+    relaxed = False
     try:
         try:
             asyncio.get_running_loop()
         except RuntimeError:
             asyncio.set_event_loop(asyncio.new_event_loop())
-        # ✅ Ensure vectorstore uses correct embeddings
-        embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=os.getenv("GEMINI_API_KEY"),
-        )
+        # ✅ Ensure vectorstore uses correct embeddings (same backend as ingest)
+        embeddings = get_embeddings()
 
         vs = get_vectorstore(embeddings=embeddings)
-        retriever = vs.as_retriever(
-            search_type="mmr", search_kwargs={"k": k, "fetch_k": max(20, k * 2)}
-        )
-        docs = retriever.invoke(question)
+        if metadata_filter:
+            # The filter already narrows the candidates, so a smaller MMR pool suffices
+            retriever = vs.as_retriever(
+                search_type="mmr",
+                search_kwargs={"k": k, "fetch_k": k * 2, "filter": metadata_filter},
+            )
+            docs = retriever.invoke(question)
+        else:
+            docs = []
+        if not docs:
+            relaxed = metadata_filter is not None
+            retriever = vs.as_retriever(
+                search_type="mmr", search_kwargs={"k": k, "fetch_k": max(20, k * 2)}
+            )
+            docs = retriever.invoke(question)
     except Exception as e:
         return {
             "question": question,
@@ -70,6 +94,7 @@ def answer_question(question: str, k: int = 8) -> Dict[str, Any]:
             "context": "NO MATCHING LOGS",
             "citations": [],
             "confidence": None,
+            "filters": applied,
         }
 
     context = _format_docs(docs) if docs else "NO MATCHING LOGS"
@@ -91,4 +116,7 @@ def answer_question(question: str, k: int = 8) -> Dict[str, Any]:
     if not result.get("citations"):
         result["citations"] = [d.page_content[:220] for d in docs[:5]]
 
+    result["filters"] = applied
+    result["filters_relaxed"] = relaxed
+
     return result
\ No newline at end of file
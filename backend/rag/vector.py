@@ -1,15 +1,14 @@
 import os
-import pinecone
-from langchain_pinecone import PineconeVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from .embeddings import get_embeddings, EMBEDDING_DIM
 
 def get_vectorstore(embeddings=None):
-    # ✅ Ensure embeddings always exist
+    # Pinecone is imported here so ingest can run against other stores without it
+    import pinecone
+    from langchain_pinecone import PineconeVectorStore
+
+    # ✅ Ensure embeddings always exist (EMBEDDINGS_BACKEND picks remote or local)
     if embeddings is None:
-        embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=os.getenv("GEMINI_API_KEY"),
-        )
+        embeddings = get_embeddings()
 
     # ✅ Init Pinecone client
     pc = pinecone.Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
@@ -20,7 +19,7 @@ def get_vectorstore(embeddings=None):
     if index_name not in existing_indexes:
         pc.create_index(
             name=index_name,
-            dimension=768,  # embedding size for models/embedding-001
+            dimension=EMBEDDING_DIM,  # embedding size for models/embedding-001 and the local embedder
             metric="cosine",
             spec=pinecone.ServerlessSpec(  # 🔹 safer for serverless setups
                 cloud="aws", region="us-east-1"
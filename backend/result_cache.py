@@ -0,0 +1,158 @@
+# backend/result_cache.py
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+# pandas/pyarrow are imported on first use to keep app start-up fast;
+# the cache is simply disabled without the parquet stack
+HAS_PARQUET = all(importlib.util.find_spec(m) is not None for m in ("pandas", "pyarrow"))
+
+from log_parser import PARSER_VERSION
+
+CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "analysis_cache")
+CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+FRAME_FILE = "parsed.parquet"
+MANIFEST_FILE = "manifest.json"
+
+
+def content_key(data: bytes) -> str:
+    """Cache key: content hash of the uploaded file plus the parser version"""
+    h = hashlib.sha256(data)
+    h.update(f"|parser={PARSER_VERSION}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class ParsedResultCache:
+    """Size-bounded, LRU-evicted store of parsed logs keyed by content hash
+
+    Each entry is a directory holding the parsed rows as Parquet (loaded lazily,
+    with column pruning) and a small JSON manifest with the analysis summary.
+    The manifest mtime doubles as the LRU clock. The parser version is part
+    of the key, so entries from an older parser are never hit again and age
+    out through LRU eviction.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return HAS_PARQUET and self.max_bytes > 0
+
+    # ---------- read ----------
+    def get_summary(self, key: str) -> Optional[Dict[str, Any]]:
+        """Manifest summary for `key`, or None on miss"""
+        if not self.enabled:
+            return None
+        path = os.path.join(self._entry(key), MANIFEST_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # touch for LRU
+        return manifest.get("summary", {})
+
+    def load_frame(self, key: str, columns: Optional[List[str]] = None):
+        """Parsed rows as a DataFrame, reading only `columns` if given"""
+        if not self.enabled:
+            return None
+        path = os.path.join(self._entry(key), FRAME_FILE)
+        if not os.path.exists(path):
+            return None
+        import pandas as pd
+        import pyarrow.parquet as pq
+        if columns:
+            available = set(pq.read_schema(path).names)
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(path, columns=columns or None)
+
+    def load_records(self, key: str, columns: Optional[List[str]] = None,
+                     offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        df = self.load_frame(key, columns)
+        if df is None:
+            return None
+        if offset or limit is not None:
+            df = df.iloc[offset: None if limit is None else offset + limit]
+        records = df.to_dict("records")
+        for rec in records:
+            # Parquet list columns come back as numpy arrays
+            if "parameters" in rec and rec["parameters"] is not None and not isinstance(rec["parameters"], list):
+                rec["parameters"] = list(rec["parameters"])
+        return records
+
+    # ---------- write ----------
+    def put(self, key: str, parsed_logs: List[Dict[str, Any]], summary: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        import pandas as pd
+        entry = self._entry(key)
+        tmp = entry + f".tmp{os.getpid()}.{threading.get_ident()}"
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            df = pd.DataFrame(parsed_logs)
+            df.to_parquet(os.path.join(tmp, FRAME_FILE), index=False)
+            with open(os.path.join(tmp, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump({
+                    "parser_version": PARSER_VERSION,
+                    "created": time.time(),
+                    "rows": len(df),
+                    "summary": summary,
+                }, f, default=str)
+            if os.path.exists(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def update_summary(self, key: str, **fields) -> None:
+        """Merge fields into an existing entry's summary (e.g. after RAG ingest)"""
+        path = os.path.join(self._entry(key), MANIFEST_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        manifest.setdefault("summary", {}).update(fields)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, default=str)
+
+    def delete(self, key: str) -> None:
+        shutil.rmtree(self._entry(key), ignore_errors=True)
+
+    def evict(self) -> int:
+        """Drop least-recently-used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, name)
+            manifest = os.path.join(entry, MANIFEST_FILE)
+            if not os.path.isfile(manifest):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            entries.append((os.path.getmtime(manifest), size, entry))
+            total += size
+
+        removed = 0
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def _entry(self, key: str) -> str:
+        if not key.isalnum():
+            raise ValueError("Invalid cache key")
+        return os.path.join(self.cache_dir, key)
@@ -0,0 +1,250 @@
+# backend/shared_miner.py
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from drain3 import TemplateMiner
+from drain3.drain import LogCluster
+from drain3.file_persistence import FilePersistence
+from drain3.template_miner_config import TemplateMinerConfig
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only (run a single worker)
+    fcntl = None
+
+# How often a worker that only matches looks for clusters learned by other workers
+JOURNAL_POLL_SECONDS = float(os.getenv("DRAIN3_JOURNAL_POLL_SECONDS", "0.5"))
+
+
+class _ReadWriteLock:
+    """Many concurrent readers or one writer; waiting writers block new readers"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self) -> None:
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class _FileLock:
+    """Exclusive cross-process lock (flock) on a side file; no-op without fcntl"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class SharedTemplateMiner:
+    """Drain3 miner safe to share between threads and between worker processes
+
+    Threads: every line first runs Drain3's own cluster selection (`tree_search`
+    with the configured sim_th, as `add_log_message` does) under a shared read
+    lock. If it picks a cluster whose template the line would not change, that
+    is the result `add_log_message` would give and no lock is upgraded; only
+    lines that create or generalize a cluster take the write lock.
+
+    Processes: each worker keeps its own Drain tree. Every cluster creation or
+    template change is appended to a journal next to the snapshot, and learning
+    happens under an exclusive file lock after replaying the journal, so all
+    workers hand out the same cluster ids. Workers that only match poll the
+    journal every JOURNAL_POLL_SECONDS.
+
+    The journal is never compacted: a cluster is created once and its template
+    can only generalize (one token at a time), so it stays small. Snapshots are
+    taken on Drain3's snapshot interval under the file lock and only speed up
+    loading; the journal alone can rebuild every cluster. LRU eviction (drain3
+    `max_clusters`) is not journaled and stays per worker.
+    """
+
+    def __init__(self, persist_file: str, config: TemplateMinerConfig):
+        self.persist_file = persist_file
+        self.journal_file = persist_file + ".journal"
+        self.config = config
+        self._rw = _ReadWriteLock()
+        self._size_lock = threading.Lock()
+        self._file_lock = _FileLock(persist_file + ".lock")
+        self._journal_pos = 0
+        self._last_poll = 0.0
+        self._last_snapshot = time.time()
+
+        with self._file_lock:
+            # Snapshots are taken here (after journaling), not by TemplateMiner itself
+            self.miner = TemplateMiner(FilePersistence(persist_file), config)
+            self.miner.persistence_handler = None
+            self._catch_up()
+
+    # ---------- journal ----------
+    def _catch_up(self) -> int:
+        """Apply journal entries written since the last call (caller holds the write lock
+        or runs before the miner is shared)"""
+        try:
+            with open(self.journal_file, "rb") as f:
+                f.seek(self._journal_pos)
+                data = f.read()
+        except OSError:
+            return 0
+        # Only complete lines; a concurrent append may be half written
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return 0
+        self._journal_pos += end
+
+        drain = self.miner.drain
+        applied = 0
+        for raw in data[:end].splitlines():
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            cid = int(entry["id"])
+            tokens = tuple(entry["tokens"])
+            cluster = drain.id_to_cluster.get(cid)
+            if entry.get("created"):
+                if cluster is None:
+                    cluster = LogCluster(tokens, cid)
+                    drain.id_to_cluster[cid] = cluster
+                    drain.add_seq_to_prefix_tree(drain.root_node, cluster)
+                drain.clusters_counter = max(drain.clusters_counter, cid)
+            elif cluster is not None:
+                # Entries are in order, so replaying old changes ends at the latest template
+                cluster.log_template_tokens = tokens
+            applied += 1
+        return applied
+
+    def _append(self, cluster_id: int, change_type: str) -> None:
+        cluster = self.miner.drain.id_to_cluster.get(cluster_id)
+        entry = {
+            "id": cluster_id,
+            "created": change_type == "cluster_created",
+            "tokens": list(cluster.log_template_tokens),
+        }
+        with open(self.journal_file, "ab") as f:
+            f.write(json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n")
+            self._journal_pos = f.tell()
+
+    def _maybe_snapshot(self, force: bool = False) -> None:
+        interval = self.config.snapshot_interval_minutes * 60
+        if force or time.time() - self._last_snapshot >= interval:
+            tmp = f"{self.persist_file}.tmp{os.getpid()}"
+            self.miner.persistence_handler = FilePersistence(tmp)
+            try:
+                self.miner.save_state("periodic" if not force else "requested")
+            finally:
+                self.miner.persistence_handler = None
+            os.replace(tmp, self.persist_file)
+            self._last_snapshot = time.time()
+
+    def _poll(self) -> None:
+        now = time.time()
+        if now - self._last_poll < JOURNAL_POLL_SECONDS:
+            return
+        self._last_poll = now
+        try:
+            size = os.path.getsize(self.journal_file)
+        except OSError:
+            return
+        if size > self._journal_pos:
+            self._rw.acquire_write()
+            try:
+                self._catch_up()
+            finally:
+                self._rw.release_write()
+
+    # ---------- mining ----------
+    def _result(self, cluster, change_type: str) -> Dict[str, Any]:
+        return {
+            "change_type": change_type,
+            "cluster_id": cluster.cluster_id,
+            "cluster_size": cluster.size,
+            "template_mined": cluster.get_template(),
+            "cluster_count": len(self.miner.drain.id_to_cluster),
+        }
+
+    def add_log_message(self, log_message: str) -> Dict[str, Any]:
+        """Same result shape as TemplateMiner.add_log_message"""
+        self._poll()
+
+        drain = self.miner.drain
+        tokens = drain.get_content_as_tokens(self.miner.masker.mask(log_message))
+        self._rw.acquire_read()
+        try:
+            # Not `match()`: that takes any fully matching cluster (even a mostly
+            # <*> one), while add_log_message picks the best by fixed tokens
+            cluster = drain.tree_search(drain.root_node, tokens, drain.sim_th, False)
+            if cluster is not None and \
+                    tuple(drain.create_template(tokens, cluster.log_template_tokens)) == cluster.log_template_tokens:
+                with self._size_lock:
+                    cluster.size += 1
+                    drain.id_to_cluster[cluster.cluster_id]  # LRU touch, as in Drain
+                return self._result(cluster, "none")
+        finally:
+            self._rw.release_read()
+
+        self._rw.acquire_write()
+        try:
+            with self._file_lock:
+                self._catch_up()
+                result = self.miner.add_log_message(log_message)
+                if result["change_type"] != "none":
+                    self._append(result["cluster_id"], result["change_type"])
+                self._maybe_snapshot()
+            return result
+        finally:
+            self._rw.release_write()
+
+    def match(self, log_message: str) -> Optional[LogCluster]:
+        self._poll()
+        self._rw.acquire_read()
+        try:
+            return self.miner.match(log_message)
+        finally:
+            self._rw.release_read()
+
+    def save_state(self) -> None:
+        self._rw.acquire_write()
+        try:
+            with self._file_lock:
+                self._catch_up()
+                self._maybe_snapshot(force=True)
+        finally:
+            self._rw.release_write()
@@ -0,0 +1,311 @@
+# backend/sketches.py
+"""
+Bounded-memory, mergeable, JSON-serializable sketches for log metrics.
+
+Error bounds:
+- HyperLogLog(p): distinct-count estimate with relative standard error
+  1.04 / sqrt(2**p) (p=14: 0.81%, 16 KiB of registers). Below ~2.5 * 2**p
+  distinct values linear counting is used, which is practically exact for
+  small uploads.
+- SpaceSaving(capacity k): over a stream of N items every reported count
+  overestimates the true count by at most its `error`, and error <= N / k.
+  Any item with true count > N / k is guaranteed to be in the summary, and
+  if the stream has at most k distinct items all counts are exact.
+- DDSketch(alpha): every quantile estimate is within relative error alpha
+  of the true value at that rank (alpha=0.01: 1%). Only when more than
+  `max_buckets` buckets are needed are the lowest buckets collapsed, which
+  affects the lowest quantiles only.
+
+All sketches merge in place with merge() (results equal to sketching the
+concatenated streams, within the bounds above) and round-trip through
+to_dict()/from_dict().
+"""
+import base64
+import hashlib
+import heapq
+import math
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+
+def _hash64(value) -> int:
+    data = value if isinstance(value, bytes) else str(value).encode("utf-8", errors="ignore")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Distinct-value estimator over 2**p one-byte registers"""
+
+    _POW = [2.0 ** -r for r in range(66)]
+
+    def __init__(self, p: int = 14):
+        if not 4 <= p <= 18:
+            raise ValueError("p must be between 4 and 18")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value) -> None:
+        h = _hash64(value)
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def update(self, values: Iterable) -> None:
+        for value in values:
+            self.add(value)
+
+    def count(self) -> int:
+        regs = self.registers
+        zeros = regs.count(0)
+        if zeros == self.m:
+            return 0
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        pow_ = self._POW
+        estimate = alpha * self.m * self.m / sum(pow_[r] for r in regs)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"p": self.p, "registers": base64.b64encode(bytes(self.registers)).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        hll = cls(int(data["p"]))
+        regs = base64.b64decode(data["registers"])
+        if len(regs) != hll.m:
+            raise ValueError("Register count does not match precision")
+        hll.registers = bytearray(regs)
+        return hll
+
+
+class SpaceSaving:
+    """Top-k heavy hitters in `capacity` counters (Metwally et al.)
+
+    Counts are overestimates; `errors[item]` bounds the overestimate.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = max(int(capacity), 1)
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        self._heap = []  # (count, item), may hold stale entries
+
+    def _min_entry(self) -> Tuple[int, Any]:
+        # Pop stale entries (items bumped or evicted since they were pushed)
+        heap = self._heap
+        while True:
+            count, item = heap[0]
+            current = self.counts.get(item)
+            if current == count:
+                return count, item
+            heapq.heappop(heap)
+            if current is not None:
+                heapq.heappush(heap, (current, item))
+
+    def add(self, item, count: int = 1) -> None:
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+            heapq.heappush(self._heap, (count, item))
+            return
+        floor, victim = self._min_entry()
+        heapq.heappop(self._heap)
+        del self.counts[victim]
+        del self.errors[victim]
+        self.counts[item] = floor + count
+        self.errors[item] = floor
+        heapq.heappush(self._heap, (floor + count, item))
+
+    def update(self, items: Iterable) -> None:
+        for item in items:
+            self.add(item)
+
+    @classmethod
+    def from_counts(cls, counts: Dict[Any, int], capacity: int = 1000) -> "SpaceSaving":
+        """Summary of exact counts (e.g. a chunk's value_counts), keeping the top `capacity`"""
+        sketch = cls(capacity)
+        top = heapq.nlargest(sketch.capacity, counts.items(), key=lambda kv: kv[1])
+        sketch.counts = {k: int(v) for k, v in top}
+        sketch.errors = {k: 0 for k in sketch.counts}
+        sketch.total = int(sum(counts.values()))
+        sketch._rebuild_heap()
+        return sketch
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(c, k) for k, c in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def _floor(self) -> int:
+        # Upper bound for the count of any item not in a full summary
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Mergeable summaries (Agarwal et al.): an item missing from one side is
+        charged that side's minimum count, then the top `capacity` are kept"""
+        floor_a, floor_b = self._floor(), other._floor()
+        counts = {}
+        errors = {}
+        for item in set(self.counts) | set(other.counts):
+            counts[item] = self.counts.get(item, floor_a) + other.counts.get(item, floor_b)
+            errors[item] = self.errors.get(item, floor_a) + other.errors.get(item, floor_b)
+        top = heapq.nlargest(self.capacity, counts.items(), key=lambda kv: kv[1])
+        self.counts = dict(top)
+        self.errors = {k: errors[k] for k in self.counts}
+        self.total += other.total
+        self._rebuild_heap()
+        return self
+
+    def top(self, n: int = 10) -> List[Tuple[Any, int]]:
+        return heapq.nlargest(n, self.counts.items(), key=lambda kv: kv[1])
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "items": [[k, c, self.errors[k]] for k, c in self.counts.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SpaceSaving":
+        sketch = cls(int(data["capacity"]))
+        sketch.total = int(data["total"])
+        for item, count, error in data["items"]:
+            sketch.counts[item] = int(count)
+            sketch.errors[item] = int(error)
+        sketch._rebuild_heap()
+        return sketch
+
+
+class DDSketch:
+    """Relative-error quantile sketch over non-negative values (Masson et al.)
+
+    Values map to logarithmic buckets of ratio gamma = (1 + alpha) / (1 - alpha);
+    values <= 0 go to a zero bucket (byte sizes and timings are often 0).
+    """
+
+    def __init__(self, alpha: float = 0.01, max_buckets: int = 2048):
+        if not 0 < alpha < 1:
+            raise ValueError("alpha must be between 0 and 1")
+        self.alpha = alpha
+        self.max_buckets = max_buckets
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float, count: int = 1) -> None:
+        if count <= 0:
+            return
+        value = float(value)
+        self.count += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value <= 0:
+            self.zero_count += count
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + count
+        if len(self.bins) > self.max_buckets:
+            self._collapse()
+
+    def update(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def _collapse(self) -> None:
+        # Fold the lowest buckets together; keeps upper quantiles within alpha
+        keys = sorted(self.bins)
+        excess = keys[:len(keys) - self.max_buckets + 1]
+        target = keys[len(excess)]
+        self.bins[target] += sum(self.bins.pop(k) for k in excess)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        q = min(max(q, 0.0), 1.0)
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                # Clamp to the exact extremes so p0/p100 are not off by alpha
+                return min(max(self._value(key), self.min), self.max)
+        return self.max
+
+    def summary(self, quantiles=(0.5, 0.9, 0.95, 0.99)) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        out = {
+            "count": self.count,
+            "mean": self.sum / self.count,
+            "min": self.min,
+            "max": self.max,
+        }
+        for q in quantiles:
+            out[f"p{q * 100:g}"] = self.quantile(q)
+        return out
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge DDSketches of different accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        while len(self.bins) > self.max_buckets:
+            self._collapse()
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "alpha": self.alpha,
+            "max_buckets": self.max_buckets,
+            "bins": {str(k): c for k, c in self.bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DDSketch":
+        sketch = cls(float(data["alpha"]), int(data["max_buckets"]))
+        sketch.bins = {int(k): int(c) for k, c in data["bins"].items()}
+        sketch.zero_count = int(data["zero_count"])
+        sketch.count = int(data["count"])
+        sketch.sum = float(data["sum"])
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        return sketch
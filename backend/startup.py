@@ -0,0 +1,92 @@
+# backend/startup.py
+import importlib
+import os
+import threading
+import time
+from typing import Dict, Any
+
+import log_parser
+
+# Heavy stacks kept out of `import app`; loaded on first use or by the warm-up thread
+LAZY_STACKS = ["google.generativeai", "rag.ingest", "rag.retrieval"]
+PRELOAD_STACKS = os.getenv("PRELOAD_STACKS", "1").lower() in ("1", "true", "yes")
+
+_state = {
+    "started": time.time(),
+    "template_miner_ms": None,
+    "stacks": {},
+    "errors": {},
+}
+_thread = None
+_thread_lock = threading.Lock()
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def get_genai():
+    """google.generativeai, imported and configured on first use"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                api_key = os.getenv("GEMINI_API_KEY", "")
+                if api_key:
+                    genai.configure(api_key=api_key)
+                _genai = genai
+    return _genai
+
+
+def _ensure_punkt() -> None:
+    # --- NLTK setup (safe) ---
+    try:
+        import nltk
+        try:
+            nltk.data.find('tokenizers/punkt')
+        except LookupError:
+            nltk.download('punkt', quiet=True)
+    except Exception as e:
+        _state["errors"]["nltk"] = str(e)
+
+
+def _warm_up() -> None:
+    t = time.time()
+    try:
+        log_parser.get_template_miner()
+    except Exception as e:
+        _state["errors"]["template_miner"] = str(e)
+    _state["template_miner_ms"] = round((time.time() - t) * 1000, 1)
+
+    _ensure_punkt()
+
+    if PRELOAD_STACKS:
+        for name in LAZY_STACKS:
+            t = time.time()
+            try:
+                if name == "google.generativeai":
+                    get_genai()
+                else:
+                    importlib.import_module(name)
+                _state["stacks"][name] = round((time.time() - t) * 1000, 1)
+            except Exception as e:
+                _state["errors"][name] = str(e)
+
+
+def start_background_init() -> None:
+    """Load miner state (and optionally the LLM/vector stacks) off the import path"""
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_warm_up, name="warm-up", daemon=True)
+            _thread.start()
+
+
+def readiness() -> Dict[str, Any]:
+    """Ready once the template miner can parse; stacks are reported, not required"""
+    return {
+        "ready": log_parser.miner_loaded(),
+        "uptime_s": round(time.time() - _state["started"], 2),
+        "template_miner_ms": _state["template_miner_ms"],
+        "stacks_loaded": dict(_state["stacks"]),
+        "errors": dict(_state["errors"]),
+    }
@@ -0,0 +1,237 @@
+# backend/template_anomaly.py
+import json
+import math
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from log_parser import PERSIST_FILE, minute_of
+from shared_miner import _FileLock
+
+# Stored next to drain3_state.bin since cluster ids are only meaningful with that state
+RATE_STATE_FILE = os.path.join(os.path.dirname(PERSIST_FILE), "template_rates_state.json")
+
+def _read_state(state_file: str) -> Dict[str, Any]:
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(state_file: str, state: Dict[str, Any]) -> None:
+    tmp = f"{state_file}.tmp{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, state_file)
+
+
+class TemplateRateDetector:
+    """Online per-template rate anomaly detector keyed by Drain3 cluster_id
+
+    Each cluster keeps an EWMA mean/variance of its per-minute count plus an
+    hour-of-day seasonal EWMA. Per-line work is a dict update; baselines are
+    only touched when the stream crosses a minute boundary, and only for the
+    templates active in the current stream (so uploading one source does not
+    decay another source's baselines). Each load() starts a fresh clock, since
+    successive uploads need not be in time order. Flags:
+      - burst: minute count well above the (seasonal) baseline
+      - new_template: cluster never seen before (across runs; not reported
+        while the detector is bootstrapping from empty state)
+      - silent: a regularly seen template stops appearing
+    """
+
+    def __init__(self, alpha: float = 0.1, z_threshold: float = 4.0, min_burst: int = 5,
+                 warmup_minutes: int = 10, silence_minutes: int = 30, silence_min_rate: float = 0.5,
+                 max_anomalies: int = 200, state_file: str = RATE_STATE_FILE):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_burst = min_burst
+        self.warmup_minutes = warmup_minutes
+        self.silence_minutes = silence_minutes
+        self.silence_min_rate = silence_min_rate
+        self.max_anomalies = max_anomalies
+        self.state_file = state_file
+
+        self.clusters = {}          # cluster_id -> baseline state
+        self.current_minute = None  # minute currently being counted
+        self.current_counts = {}    # cluster_id -> count within current_minute
+        self.active = set()         # cluster ids seen in this stream
+        self.anomalies = []
+        self.bootstrapping = True
+        self._ts_cache = {}
+
+    # ---------- persistence ----------
+    @classmethod
+    def load(cls, state_file: str = RATE_STATE_FILE, **kwargs) -> "TemplateRateDetector":
+        det = cls(state_file=state_file, **kwargs)
+        det.clusters = {int(k): v for k, v in _read_state(state_file).get("clusters", {}).items()}
+        det.bootstrapping = not det.clusters
+        return det
+
+    def save(self, last_report: Optional[Dict[str, Any]] = None) -> None:
+        """Merge this stream's baselines into the state file
+
+        Under a file lock, the state on disk is re-read and only the templates
+        this detector saw are replaced, so a concurrent upload's baselines for
+        other templates survive.
+        """
+        report = last_report if last_report is not None else self.get_report()
+        with _FileLock(self.state_file + ".lock"):
+            state = _read_state(self.state_file)
+            clusters = state.get("clusters", {})
+            clusters.update({str(cid): self.clusters[cid] for cid in self.active})
+            _write_state(self.state_file, {"clusters": clusters, "last_report": report})
+
+    @staticmethod
+    def save_last_report(report: Dict[str, Any], state_file: str = RATE_STATE_FILE) -> None:
+        """Replace only the stored report, e.g. with a cached upload's (baselines untouched)"""
+        with _FileLock(state_file + ".lock"):
+            state = _read_state(state_file)
+            state["last_report"] = report
+            _write_state(state_file, state)
+
+    @staticmethod
+    def load_last_report(state_file: str = RATE_STATE_FILE) -> Dict[str, Any]:
+        """Report from the most recent upload, for /metrics (no re-parse)"""
+        return _read_state(state_file).get("last_report") or {}
+
+    # ---------- streaming ----------
+    def observe(self, cluster_id: int, template: str, timestamp: str) -> None:
+        """Count one parsed line; cheap enough to call inside the parse loop"""
+        if cluster_id is None or cluster_id < 0:
+            return
+
+        minute = self._minute(timestamp)
+        if minute is None:
+            minute = self.current_minute if self.current_minute is not None else 0
+        if self.current_minute is None:
+            self.current_minute = minute
+        elif minute > self.current_minute:
+            self._close_minutes(minute)
+
+        cid = int(cluster_id)
+        if cid not in self.clusters:
+            self.clusters[cid] = {
+                "template": template,
+                "mean": 0.0,
+                "var": 0.0,
+                "minutes": 0,
+                "seasonal": [None] * 24,
+                "last_seen": minute,
+                "silent": False,
+            }
+            if not self.bootstrapping:
+                self._flag("new_template", cid, minute, count=1)
+        else:
+            state = self.clusters[cid]
+            state["template"] = template or state["template"]
+            state["last_seen"] = minute if cid not in self.active else max(state["last_seen"], minute)
+            state["silent"] = False
+        self.active.add(cid)
+        self.current_counts[cid] = self.current_counts.get(cid, 0) + 1
+
+    def flush(self) -> None:
+        """Close out the minute in progress (call at end of a batch)"""
+        if self.current_minute is not None and self.current_counts:
+            self._close_minutes(self.current_minute + 1)
+
+    def get_report(self) -> Dict[str, Any]:
+        by_type = {}
+        for a in self.anomalies:
+            by_type[a["type"]] = by_type.get(a["type"], 0) + 1
+        return {
+            "tracked_templates": len(self.clusters),
+            "anomaly_count": len(self.anomalies),
+            "by_type": by_type,
+            "anomalies": self.anomalies,
+        }
+
+    def describe(self, limit: int = 20) -> List[str]:
+        """Short human-readable lines for the LLM prompt / fallback summary"""
+        out = []
+        for a in self.anomalies[:limit]:
+            if a["type"] == "burst":
+                out.append(f"Burst at {a['minute']}: template #{a['cluster_id']} seen {a['count']}x/min "
+                           f"(baseline {a['baseline']}) - {a['template']}")
+            elif a["type"] == "silent":
+                out.append(f"Silent since {a['minute']}: template #{a['cluster_id']} "
+                           f"(was {a['baseline']}/min) - {a['template']}")
+            else:
+                out.append(f"New template #{a['cluster_id']} at {a['minute']} - {a['template']}")
+        return out
+
+    # ---------- internals ----------
+    def _minute(self, timestamp: str) -> Optional[int]:
+        minute = self._ts_cache.get(timestamp)
+        if minute is None and timestamp not in self._ts_cache:
+            if len(self._ts_cache) > 4096:
+                self._ts_cache.clear()
+            minute = minute_of(timestamp)
+            self._ts_cache[timestamp] = minute
+        return minute
+
+    def _close_minutes(self, next_minute: int) -> None:
+        """Fold finished minutes into the active baselines, then move the clock forward"""
+        closed = self.current_minute
+        gap = next_minute - closed  # closed minute + (gap - 1) empty minutes
+        hour = (closed // 60) % 24
+
+        for cid in self.active:
+            state = self.clusters[cid]
+            count = self.current_counts.get(cid, 0)
+            baseline = self._baseline(state, hour)
+            std = math.sqrt(state["var"])
+
+            if (count and state["minutes"] >= self.warmup_minutes and count >= self.min_burst
+                    and count > baseline + self.z_threshold * max(std, 1.0)):
+                self._flag("burst", cid, closed, count=count, baseline=round(baseline, 2))
+
+            self._update(state, count, hour)
+            if gap > 1:
+                self._decay(state, gap - 1)
+
+            idle = next_minute - state["last_seen"]
+            if (not state["silent"] and idle > self.silence_minutes
+                    and state["minutes"] >= self.warmup_minutes and state["mean"] >= self.silence_min_rate):
+                state["silent"] = True
+                self._flag("silent", cid, state["last_seen"], baseline=round(state["mean"], 2))
+
+        self.current_counts = {}
+        self.current_minute = next_minute
+
+    def _baseline(self, state: Dict[str, Any], hour: int) -> float:
+        seasonal = state["seasonal"][hour]
+        return seasonal if seasonal is not None else state["mean"]
+
+    def _update(self, state: Dict[str, Any], count: int, hour: int) -> None:
+        a = self.alpha
+        if state["minutes"] == 0:
+            state["mean"] = float(count)
+        else:
+            diff = count - state["mean"]
+            incr = a * diff
+            state["mean"] += incr
+            state["var"] = (1 - a) * (state["var"] + diff * incr)
+        seasonal = state["seasonal"][hour]
+        state["seasonal"][hour] = float(count) if seasonal is None else seasonal + a * (count - seasonal)
+        state["minutes"] += 1
+
+    def _decay(self, state: Dict[str, Any], empty_minutes: int) -> None:
+        """Closed-form EWMA update for a run of zero-count minutes"""
+        keep = (1 - self.alpha) ** min(empty_minutes, 10000)
+        state["var"] = keep * (state["var"] + (1 - keep) * state["mean"] ** 2)
+        state["mean"] *= keep
+        state["minutes"] += empty_minutes
+
+    def _flag(self, kind: str, cid: int, minute: int, **extra) -> None:
+        if len(self.anomalies) >= self.max_anomalies:
+            return
+        self.anomalies.append({
+            "type": kind,
+            "cluster_id": cid,
+            "template": self.clusters[cid]["template"],
+            "minute": datetime.fromtimestamp(minute * 60, tz=timezone.utc).strftime("%Y-%m-%d %H:%M") if minute else "",
+            **extra,
+        })
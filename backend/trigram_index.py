@@ -0,0 +1,369 @@
+# backend/trigram_index.py
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Iterator
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+INDEX_DIR = os.getenv("SEARCH_INDEX_DIR", "search_index")
+INDEX_MAX_BYTES = int(os.getenv("SEARCH_INDEX_MAX_BYTES", str(1024 * 1024 * 1024)))
+OPEN_INDEXES = int(os.getenv("SEARCH_INDEX_OPEN", "8"))
+LATEST_FILE = "LATEST"
+
+LINES_FILE = "lines.log"
+OFFSETS_FILE = "offsets.bin"     # uint64 byte offset of each line in lines.log
+CLUSTERS_FILE = "clusters.bin"   # int32 Drain3 cluster id of each line
+KEYS_FILE = "keys.bin"           # sorted uint32 trigram keys
+POSTINGS_FILE = "postings.bin"   # varint delta-encoded line numbers, per key
+SPANS_FILE = "spans.bin"         # uint64 (start, end) into postings.bin, per key
+META_FILE = "meta.json"
+
+MAX_QUERY_TRIGRAMS = 4
+
+
+# ---------- varint / delta coding ----------
+def _encode_varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_postings(buf: bytes) -> Iterator[int]:
+    """Lazily decode a delta/varint posting list into ascending line numbers"""
+    last = 0
+    value = 0
+    shift = 0
+    for byte in buf:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        last += value
+        yield last
+        value = 0
+        shift = 0
+
+
+def _intersect(lists: List[Iterator[int]]) -> Iterator[int]:
+    """Leapfrog intersection of ascending iterators; stops as soon as one runs out"""
+    try:
+        heads = [next(it) for it in lists]
+        while True:
+            target = max(heads)
+            aligned = True
+            for i, it in enumerate(lists):
+                while heads[i] < target:
+                    heads[i] = next(it)
+                if heads[i] != target:
+                    aligned = False
+            if aligned:
+                yield target
+                heads[0] = next(lists[0])
+    except StopIteration:
+        return
+
+
+def _trigram_keys(text: bytes):
+    """Trigrams of bytes packed as 24-bit ints; callers pass _folded() text"""
+    return {(text[i] << 16) | (text[i + 1] << 8) | text[i + 2] for i in range(len(text) - 2)}
+
+
+def _folded(text: str) -> bytes:
+    """UTF-8 of the lowercased text; str.lower() so that non-ASCII case variants
+    ("ÉTIENNE"/"étienne") share trigrams, which bytes.lower() would not do"""
+    return text.lower().encode("utf-8", errors="ignore")
+
+
+# ---------- building ----------
+class TrigramIndexBuilder:
+    """Builds an on-disk trigram index incrementally while an upload is parsed
+
+    Posting lists are kept delta/varint-compressed in memory from the start,
+    so the builder holds roughly the size of the final index.
+    """
+
+    def __init__(self, analysis_id: str, index_dir: str = INDEX_DIR,
+                 max_bytes: int = INDEX_MAX_BYTES):
+        self.index_dir = index_dir
+        self.max_bytes = max_bytes
+        self.analysis_id = analysis_id
+        self.path = os.path.join(index_dir, analysis_id)
+        self.tmp_path = f"{self.path}.tmp{os.getpid()}.{threading.get_ident()}"
+        os.makedirs(self.tmp_path, exist_ok=True)
+
+        self._lines = open(os.path.join(self.tmp_path, LINES_FILE), "wb")
+        self._offsets = array("Q")
+        self._clusters = array("i")
+        self._postings = {}  # key -> [last line number, bytearray]
+        self._templates = {}
+        self._pos = 0
+
+    def add(self, line: str, cluster_id: int = -1, template: str = "") -> None:
+        data = line.encode("utf-8", errors="ignore")
+        line_no = len(self._offsets)
+        self._offsets.append(self._pos)
+        self._clusters.append(int(cluster_id))
+        self._lines.write(data + b"\n")
+        self._pos += len(data) + 1
+        if template and cluster_id >= 0:
+            self._templates[int(cluster_id)] = template
+
+        postings = self._postings
+        for key in _trigram_keys(_folded(line)):
+            entry = postings.get(key)
+            if entry is None:
+                buf = bytearray()
+                _encode_varint(line_no, buf)
+                postings[key] = [line_no, buf]
+            else:
+                _encode_varint(line_no - entry[0], entry[1])
+                entry[0] = line_no
+
+    def finish(self) -> str:
+        self._lines.close()
+        keys = array("I", sorted(self._postings))
+        spans = array("Q")
+        with open(os.path.join(self.tmp_path, POSTINGS_FILE), "wb") as f:
+            pos = 0
+            for key in keys:
+                buf = self._postings[key][1]
+                f.write(buf)
+                spans.extend((pos, pos + len(buf)))
+                pos += len(buf)
+
+        for name, arr in ((OFFSETS_FILE, self._offsets), (CLUSTERS_FILE, self._clusters),
+                          (KEYS_FILE, keys), (SPANS_FILE, spans)):
+            with open(os.path.join(self.tmp_path, name), "wb") as f:
+                arr.tofile(f)
+        with open(os.path.join(self.tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"lines": len(self._offsets), "templates": self._templates}, f)
+
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp_path, self.path)
+        with open(os.path.join(self.index_dir, LATEST_FILE), "w", encoding="utf-8") as f:
+            f.write(self.analysis_id)
+        self._postings = {}
+        evict(self.index_dir, self.max_bytes)
+        return self.path
+
+    def abort(self) -> None:
+        self._lines.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+def index_exists(analysis_id: str, index_dir: str = INDEX_DIR) -> bool:
+    return os.path.isfile(os.path.join(index_dir, analysis_id, META_FILE))
+
+
+def latest_index(index_dir: str = INDEX_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(index_dir, LATEST_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def mark_latest(analysis_id: str, index_dir: str = INDEX_DIR) -> None:
+    with open(os.path.join(index_dir, LATEST_FILE), "w", encoding="utf-8") as f:
+        f.write(analysis_id)
+
+
+def evict(index_dir: str = INDEX_DIR, max_bytes: int = INDEX_MAX_BYTES) -> int:
+    """Drop least-recently-used indexes until the directory fits in max_bytes
+
+    meta.json mtime is the LRU clock (touched by open_index); unfinished
+    builds have no meta.json and are left alone.
+    """
+    entries = []
+    total = 0
+    for name in os.listdir(index_dir):
+        entry = os.path.join(index_dir, name)
+        meta = os.path.join(entry, META_FILE)
+        if not os.path.isfile(meta):
+            continue
+        size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+        entries.append((os.path.getmtime(meta), size, entry))
+        total += size
+
+    removed = 0
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+# ---------- query planning ----------
+def _literal_runs(parsed, runs: List[str], current: List[str]) -> bool:
+    """Collect literal strings every match must contain; False if the pattern
+    has a top-level alternation (no safe requirement can be derived)"""
+    for op, arg in parsed:
+        name = str(op)
+        if name == "LITERAL":
+            current.append(chr(arg))
+            continue
+        runs.append("".join(current))
+        current.clear()
+        if name == "BRANCH":
+            return False
+        if name == "SUBPATTERN":
+            sub = arg[-1]
+            # A group's literals are required only if the group has no alternation itself
+            inner_runs, inner_current = [], []
+            if _literal_runs(sub, inner_runs, inner_current):
+                runs.extend(inner_runs + ["".join(inner_current)])
+        elif name in ("MAX_REPEAT", "MIN_REPEAT") and arg[0] >= 1:
+            inner_runs, inner_current = [], []
+            if _literal_runs(arg[2], inner_runs, inner_current):
+                runs.extend(inner_runs + ["".join(inner_current)])
+    return True
+
+
+def required_trigrams(query: str, regex: bool) -> Optional[set]:
+    """Trigram keys a matching line must contain, or None to scan everything"""
+    if regex:
+        try:
+            parsed = sre_parse.parse(query)
+        except re.error:
+            raise ValueError("Invalid regular expression")
+        runs, current = [], []
+        if not _literal_runs(parsed, runs, current):
+            return None
+        runs.append("".join(current))
+    else:
+        runs = [query]
+
+    keys = set()
+    for run in runs:
+        folded = _folded(run)
+        if len(folded) >= 3:
+            keys |= _trigram_keys(folded)
+    return keys or None
+
+
+# ---------- searching ----------
+class TrigramIndex:
+    """Read side of an index written by TrigramIndexBuilder
+
+    The fixed-width files are memory-mapped rather than read, so opening an
+    index costs the meta.json parse and pages are pulled in only as a query
+    touches them. Use open_index() to reuse an opened index across requests.
+    """
+
+    def __init__(self, analysis_id: str, index_dir: str = INDEX_DIR):
+        self.path = os.path.join(index_dir, analysis_id)
+        with open(os.path.join(self.path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.line_count = meta["lines"]
+        self.templates = {int(k): v for k, v in meta["templates"].items()}
+        self.keys = self._load(KEYS_FILE, "I")
+        self.spans = self._load(SPANS_FILE, "Q")
+        self.offsets = self._load(OFFSETS_FILE, "Q")
+        self.clusters = self._load(CLUSTERS_FILE, "i")
+
+    def _load(self, name: str, typecode: str):
+        with open(os.path.join(self.path, name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return array(typecode)  # mmap rejects empty files
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecode)
+
+    def candidates(self, keys: Optional[set]) -> Iterator[int]:
+        """Line numbers containing every key (ascending); all lines if keys is None.
+        Posting lists are decoded lazily, so a filled result page stops the work."""
+        if not keys:
+            yield from range(self.line_count)
+            return
+        spans = []
+        for key in keys:
+            i = bisect_left(self.keys, key)
+            if i >= len(self.keys) or self.keys[i] != key:
+                return
+            spans.append((self.spans[2 * i + 1] - self.spans[2 * i], i))
+        # The rarest few trigrams narrow the set almost as well as all of them, and
+        # every candidate is verified against the real pattern anyway
+        spans = sorted(spans)[:MAX_QUERY_TRIGRAMS]
+        lists = []
+        with open(os.path.join(self.path, POSTINGS_FILE), "rb") as f:
+            for _, i in spans:
+                f.seek(self.spans[2 * i])
+                lists.append(_decode_postings(f.read(self.spans[2 * i + 1] - self.spans[2 * i])))
+        yield from _intersect(lists)
+
+    def search(self, query: str, regex: bool = True, ignore_case: bool = False,
+               page: int = 1, page_size: int = 50) -> Dict[str, Any]:
+        keys = required_trigrams(query, regex)
+        flags = re.IGNORECASE if ignore_case else 0
+        matcher = re.compile(query if regex else re.escape(query), flags)
+
+        skip = max(page - 1, 0) * page_size
+        results = []
+        has_more = False
+        scanned = 0
+        with open(os.path.join(self.path, LINES_FILE), "rb") as f:
+            for line_no in self.candidates(keys):
+                f.seek(self.offsets[line_no])
+                text = f.readline().decode("utf-8", errors="ignore").rstrip("\n")
+                scanned += 1
+                if not matcher.search(text):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                if len(results) == page_size:
+                    has_more = True
+                    break
+                cid = self.clusters[line_no]
+                results.append({
+                    "line_number": line_no + 1,
+                    "line": text,
+                    "cluster_id": cid,
+                    "template": self.templates.get(cid, ""),
+                })
+
+        return {
+            "query": query,
+            "page": page,
+            "page_size": page_size,
+            "results": results,
+            "has_more": has_more,
+            "candidates_checked": scanned,
+            "indexed_lines": self.line_count,
+            "used_index": keys is not None,
+        }
+
+
+_open_indexes = OrderedDict()  # (index_dir, analysis_id) -> (meta.json inode, TrigramIndex)
+
+
+def open_index(analysis_id: str, index_dir: str = INDEX_DIR) -> TrigramIndex:
+    """TrigramIndex for `analysis_id`, reused while its meta.json is unchanged
+
+    Touches meta.json so evict() sees the index as recently used. Evicted
+    indexes stay readable through already-open maps until dropped from here.
+    """
+    meta = os.path.join(index_dir, analysis_id, META_FILE)
+    os.utime(meta)
+    # A rebuild swaps in a new directory, so the inode identifies the version
+    inode = os.stat(meta).st_ino
+    key = (index_dir, analysis_id)
+    cached = _open_indexes.pop(key, None)
+    if cached is None or cached[0] != inode:
+        cached = (inode, TrigramIndex(analysis_id, index_dir))
+    _open_indexes[key] = cached
+    while len(_open_indexes) > OPEN_INDEXES:
+        _open_indexes.popitem(last=False)
+    return cached[1]
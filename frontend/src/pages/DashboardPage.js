@@ -51,6 +51,7 @@ const Dashboard = () => {
     error_codes: {},
     levels: {},
     top_ips: {},
+    template_anomalies: {},
   });
 
   useEffect(() => {
@@ -63,6 +64,7 @@ const Dashboard = () => {
           error_codes: res.data?.error_codes || {},
           levels: res.data?.levels || {},
           top_ips: res.data?.top_ips || {},
+          template_anomalies: res.data?.template_anomalies || {},
         });
       } catch (err) {
         console.error("Error fetching metrics:", err);
@@ -127,6 +129,24 @@ const Dashboard = () => {
         <Pie data={pieData} />
       </div>
 
+      <div style={{ marginBottom: "20px" }}>
+        <h3>Template Rate Anomalies</h3>
+        {(metrics.template_anomalies.anomalies || []).length === 0 ? (
+          <p>No template anomalies detected.</p>
+        ) : (
+          <ul>
+            {metrics.template_anomalies.anomalies.slice(0, 20).map((a, i) => (
+              <li key={i}>
+                <b>{a.type}</b> [{a.minute}] #{a.cluster_id}
+                {a.count !== undefined && <> – {a.count}/min</>}
+                {a.baseline !== undefined && <> (baseline {a.baseline})</>}
+                : {a.template}
+              </li>
+            ))}
+          </ul>
+        )}
+      </div>
+
       <div style={{ height: "400px", marginTop: "20px" }}>
         <h3>Top IPs</h3>
         <MapContainer